@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/1.9/ref/settings/
 """
 
+import importlib.util
 import os
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -51,6 +52,7 @@ MIDDLEWARE_CLASSES = [
     'django.contrib.auth.middleware.SessionAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'assassin_game.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'assassin2017.urls'
@@ -81,6 +83,10 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # a file rather than django's in-memory default, so tests see sqlite's real locking between connections
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        },
     }
 }
 
@@ -118,6 +124,22 @@ USE_L10N = True
 USE_TZ = True
 
 
+# Cache
+# https://docs.djangoproject.com/en/1.9/topics/cache/
+
+# local memory is per process, point this at memcached or redis when running more than one worker
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'assassin2017',
+    }
+}
+
+# cache holding read-only API responses and how long (seconds) an entry lives without being invalidated
+API_CACHE_ALIAS = 'default'
+API_CACHE_TIMEOUT = 300
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/1.9/howto/static-files/
 
@@ -129,16 +151,96 @@ STATIC_URL = '/static/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 MEDIA_URL = '/media/'
 
+# largest video accepted through the resumable upload API, in bytes
+MAX_VIDEO_UPLOAD_SIZE = 200 * 1024 * 1024
+
+# how /media/ hands files to the web server: None streams them from Django, 'x-sendfile' (apache/lighttpd) or
+# 'x-accel-redirect' (nginx, with an internal location at MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT)
+MEDIA_SENDFILE_BACKEND = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# the media worker (manage.py run_media_worker) shells out to ffmpeg for thumbnails and web videos
+FFMPEG_BINARY = 'ffmpeg'
+MEDIA_JOB_MAX_ATTEMPTS = 3
+# seconds a job can stay running before it's taken to belong to a worker that died, and is run again
+MEDIA_JOB_TIMEOUT = 30 * 60
+
+# Profiling
+
+# ProfilingMiddleware keeps the last PROFILING_SAMPLES timings of every view (see /api/profiling/, staff only) and
+# logs requests slower than PROFILING_SLOW_REQUEST_MS with their sql
+PROFILING_ENABLED = False
+PROFILING_SLOW_REQUEST_MS = 500
+PROFILING_SAMPLES = 1000
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'assassin_game.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
 # Rest Framework
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'assassin_game.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
-    'DEFAULT_FILTER_BACKENDS': ('django_filters.rest_framework.DjangoFilterBackend',)
+    'DEFAULT_FILTER_BACKENDS': ('django_filters.rest_framework.DjangoFilterBackend',),
+    'DEFAULT_PAGINATION_CLASS': 'assassin_game.pagination.IdCursorPagination',
+    'PAGE_SIZE': 25,
+    # compact formats for mobile clients, picked with the Accept header or ?format=columnar / ?format=msgpack
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'assassin_game.renderers.ColumnarJSONRenderer',
+    ),
 }
 
+# MessagePack needs the optional msgpack package
+if importlib.util.find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] += ('assassin_game.renderers.MessagePackRenderer',)
+
+# resolved tokens are kept in a per-process LRU for TOKEN_CACHE_LOCAL_TIMEOUT seconds and in the cache named by
+# TOKEN_CACHE_ALIAS (None to skip it) for TOKEN_CACHE_TIMEOUT. deleting a token or saving its user invalidates both
+TOKEN_CACHE_ALIAS = 'default'
+TOKEN_CACHE_TIMEOUT = 300
+TOKEN_CACHE_LOCAL_TIMEOUT = 30
+TOKEN_CACHE_SIZE = 1000
+
+# Game
+
+# players ranked this high or better when they make a kill earn the Leaderboard badge
+LEADERBOARD_BADGE_RANK = 10
+
+# the kill map (/api/games/<id>/map/) keeps heatmap cells for these grid zooms and sends single kills from
+# KILL_MAP_POINTS_ZOOM in, up to KILL_MAP_MAX_POINTS of them
+KILL_MAP_ZOOMS = (10, 13, 16)
+KILL_MAP_POINTS_ZOOM = 17
+KILL_MAP_MAX_POINTS = 500
+
+# results per type from /api/search/
+SEARCH_LIMIT = 20
+
+# posts reported this many times show up in the moderation queue (/api/posts/moderation/) whatever their status
+MODERATION_REPORT_THRESHOLD = 3
+
+# /api/events/ fans out through an in-process broker, every worker only sees the writes it made itself. run a
+# single worker process (threads are fine) or set EVENT_BROKER to a broker shared between processes
+EVENT_BROKER = 'assassin_game.events.LocalBroker'
+EVENT_QUEUE_SIZE = 100
+EVENT_HISTORY_SIZE = 256
+
 # Override production variables if DJANGO_DEVELOPMENT env variable is set
 if DEBUG:
 
@@ -13,9 +13,11 @@ Including another URLconf
     1. Import the include() function: from django.conf.urls import url, include
     2. Add a URL to urlpatterns:  url(r'^blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.conf.urls import url, include
 from django.contrib import admin
 from rest_framework.authtoken import views
+from assassin_game import media
 
 urlpatterns = [
     url(r'^api/', include('assassin_game.urls')),
@@ -29,3 +31,7 @@ urlpatterns += [
 urlpatterns += [
     url(r'^api-token-auth/', views.obtain_auth_token)
 ]
+
+urlpatterns += [
+    url(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), media.serve, name='media')
+]
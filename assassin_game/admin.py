@@ -1,12 +1,70 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from assassin_game.models import Game, Player, Post, Like, Comment, CommentLike, UserGameStatus
+from assassin_game import moderation, ring
+
+
+class GameAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'status')
+    list_filter = ('status',)
+    actions = ['start_games']
+
+    def start_games(self, request, queryset):
+        for game in queryset:
+            try:
+                game, statuses = ring.start(game)
+                self.message_user(request, 'Started %s with %d players' % (game, len(statuses)))
+            except ValueError as e:
+                self.message_user(request, str(e), level=messages.ERROR)
+    start_games.short_description = 'Start selected games and shuffle targets'
+
+
+class PlayerAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'year')
+    list_select_related = ('user',)
+
+
+class PostAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'game', 'status', 'time_confirmed', 'like_count', 'comment_count', 'report_count')
+    list_filter = ('status', 'game')
+    list_select_related = ('poster', 'killed', 'game')
+    readonly_fields = ('like_count', 'comment_count', 'report_count')
+    actions = ['verify_posts', 'deny_posts']
+
+    def verify_posts(self, request, queryset):
+        posts = moderation.resolve(list(queryset.values_list('pk', flat=True)), True)
+        self.message_user(request, 'Verified %d conflicting posts' % len(posts))
+    verify_posts.short_description = 'Verify selected conflicting posts'
+
+    def deny_posts(self, request, queryset):
+        posts = moderation.resolve(list(queryset.values_list('pk', flat=True)), False)
+        self.message_user(request, 'Denied %d conflicting posts' % len(posts))
+    deny_posts.short_description = 'Deny selected conflicting posts'
+
+
+class LikeAdmin(admin.ModelAdmin):
+    list_select_related = ('liker',)
+
+
+class CommentAdmin(admin.ModelAdmin):
+    list_select_related = ('commenter',)
+    readonly_fields = ('like_count',)
+
+
+class CommentLikeAdmin(admin.ModelAdmin):
+    list_select_related = ('liker',)
+
+
+class UserGameStatusAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'game', 'target', 'status')
+    list_filter = ('status', 'game')
+    list_select_related = ('user', 'game', 'target')
 
 
 # Register your models here.
-admin.site.register(Game)
-admin.site.register(Player)
-admin.site.register(Post)
-admin.site.register(Like)
-admin.site.register(Comment)
-admin.site.register(CommentLike)
-admin.site.register(UserGameStatus)
\ No newline at end of file
+admin.site.register(Game, GameAdmin)
+admin.site.register(Player, PlayerAdmin)
+admin.site.register(Post, PostAdmin)
+admin.site.register(Like, LikeAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(CommentLike, CommentLikeAdmin)
+admin.site.register(UserGameStatus, UserGameStatusAdmin)
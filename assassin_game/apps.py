@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class AssassinGameConfig(AppConfig):
     name = 'assassin_game'
+
+    def ready(self):
+        # importing these connects their signal receivers
+        from assassin_game import authentication, badges, cache, counters, events, killmap, processing  # noqa
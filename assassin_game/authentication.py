@@ -0,0 +1,109 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+# least recently used entries go first once there are `size` of them, and nothing is served after its ttl
+class LRUCache(object):
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.time() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local = LRUCache(getattr(settings, 'TOKEN_CACHE_SIZE', 1000), getattr(settings, 'TOKEN_CACHE_LOCAL_TIMEOUT', 30))
+
+
+def shared_cache():
+    alias = getattr(settings, 'TOKEN_CACHE_ALIAS', 'default')
+    return caches[alias] if alias else None
+
+
+def cache_key(key):
+    return 'auth-token:%s' % hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def forget(key):
+    local.delete(key)
+    if shared_cache() is not None:
+        shared_cache().delete(cache_key(key))
+
+
+# what is cached for a token: its user's pk and the flags permission checks read. the rest of the user, password
+# hash included, stays out of the cache and is loaded from the database only if a request reads it
+USER_FIELDS = ('id', 'is_active', 'is_staff', 'is_superuser')
+
+
+# TokenAuthentication without the token and user query on every request. users are looked up in this process's
+# LRU, then the shared cache, then the database. writes in this process invalidate right away, other processes
+# stop serving their copy within TOKEN_CACHE_LOCAL_TIMEOUT
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        values = local.get(key)
+        if values is None and shared_cache() is not None:
+            values = shared_cache().get(cache_key(key))
+            if values is not None:
+                local.set(key, values)
+
+        if values is None:
+            user, token = super(CachedTokenAuthentication, self).authenticate_credentials(key)
+            values = tuple(getattr(user, field) for field in USER_FIELDS)
+            local.set(key, values)
+            if shared_cache() is not None:
+                shared_cache().set(cache_key(key), values, getattr(settings, 'TOKEN_CACHE_TIMEOUT', 300))
+            return user, token
+
+        # a new user for every request so per-request state on it doesn't leak into the next one
+        user = User.from_db(User.objects.db, USER_FIELDS, values)
+        return user, Token(key=key, user=user)
+
+
+@receiver(post_delete, sender=Token)
+@receiver(post_save, sender=Token)
+def token_changed(sender, instance, **kwargs):
+    forget(instance.key)
+
+
+# covers deactivation and password changes, and keeps the cached user's other fields current too
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, **kwargs):
+    if not created:
+        for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+            forget(key)
@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+from assassin_game.models import Badge, DailyKillCount, LeaderboardEntry, Post, UserGameStatus
+from assassin_game.ring import LIVING
+from assassin_game.signals import post_verified
+
+FIRST_BLOOD = 'f'
+THREE_KILLS_ONE_DAY = '3'
+FIVE_KILLS_ONE_DAY = '5'
+WINNER = 'w'
+LEADERBOARD = 'l'
+TOP = 't'
+
+DAILY_KILL_BADGES = {3: THREE_KILLS_ONE_DAY, 5: FIVE_KILLS_ONE_DAY}
+RECOMPUTED_TYPES = (FIRST_BLOOD, THREE_KILLS_ONE_DAY, FIVE_KILLS_ONE_DAY, WINNER, LEADERBOARD, TOP)
+
+
+def leaderboard_badge_rank():
+    return getattr(settings, 'LEADERBOARD_BADGE_RANK', 10)
+
+
+def kill_day(post):
+    return timezone.localtime(post.time_confirmed).date()
+
+
+# bumps the killer's counter for the day and returns the new total without reading their other posts
+def count_daily_kill(post):
+    counts = DailyKillCount.objects.filter(game=post.game_id, user=post.poster_id, day=kill_day(post))
+    if not counts.update(kills=F('kills') + 1):
+        try:
+            with transaction.atomic():
+                DailyKillCount.objects.create(game_id=post.game_id, user_id=post.poster_id, day=kill_day(post),
+                                              kills=1)
+                return 1
+        except IntegrityError:
+            counts.update(kills=F('kills') + 1)
+    return counts.values_list('kills', flat=True).get()
+
+
+def rank_badges(rank):
+    types = []
+    if rank <= leaderboard_badge_rank():
+        types.append(LEADERBOARD)
+    if rank == 1:
+        types.append(TOP)
+    return types
+
+
+@receiver(post_verified)
+def award_badges(sender, post, **kwargs):
+    types = []
+
+    if not Badge.objects.filter(game=post.game_id, type=FIRST_BLOOD).exists():
+        types.append(FIRST_BLOOD)
+
+    daily_badge = DAILY_KILL_BADGES.get(count_daily_kill(post))
+    if daily_badge:
+        types.append(daily_badge)
+
+    rank = LeaderboardEntry.objects.filter(game=post.game_id, user=post.poster_id).values_list('rank', flat=True)
+    if rank:
+        types.extend(rank_badges(rank[0]))
+
+    living = UserGameStatus.objects.filter(game=post.game_id, status__in=LIVING).values_list('user_id', flat=True)
+    if list(living[:2]) == [post.poster_id]:
+        types.append(WINNER)
+
+    # each badge type is awarded at most once per player per game
+    if types:
+        owned = set(Badge.objects.filter(game=post.game_id, user=post.poster_id).values_list('type', flat=True))
+        Badge.objects.bulk_create(Badge(game_id=post.game_id, user_id=post.poster_id, type=t)
+                                  for t in types if t not in owned)
+
+
+# replays every verified post of the game in order, in one streaming pass, and rewrites its earned badges
+def recompute(game):
+    with transaction.atomic():
+        Badge.objects.filter(game=game, type__in=RECOMPUTED_TYPES).delete()
+        DailyKillCount.objects.filter(game=game).delete()
+
+        badges = set()
+        first_blood = True
+        daily = {}
+        kills = {}
+        players_with_kills = {}
+
+        posts = Post.objects.filter(game=game, status='v').order_by('time_confirmed', 'id').only(
+            'poster', 'time_confirmed')
+        for post in posts.iterator():
+            if first_blood:
+                badges.add((post.poster_id, FIRST_BLOOD))
+                first_blood = False
+
+            key = (post.poster_id, kill_day(post))
+            daily[key] = daily.get(key, 0) + 1
+            if daily[key] in DAILY_KILL_BADGES:
+                badges.add((post.poster_id, DAILY_KILL_BADGES[daily[key]]))
+
+            previous = kills.get(post.poster_id, 0)
+            kills[post.poster_id] = previous + 1
+            if previous:
+                players_with_kills[previous] -= 1
+            players_with_kills[previous + 1] = players_with_kills.get(previous + 1, 0) + 1
+
+            rank = 1 + sum(n for k, n in players_with_kills.items() if k > previous + 1)
+            for t in rank_badges(rank):
+                badges.add((post.poster_id, t))
+
+        living = UserGameStatus.objects.filter(game=game, status__in=LIVING).values_list('user_id', flat=True)
+        living = list(living[:2])
+        if len(living) == 1 and kills:
+            badges.add((living[0], WINNER))
+
+        DailyKillCount.objects.bulk_create(DailyKillCount(game=game, user_id=user_id, day=day, kills=n)
+                                           for (user_id, day), n in daily.items())
+        Badge.objects.bulk_create(Badge(game=game, user_id=user_id, type=t) for user_id, t in badges)
+        return badges
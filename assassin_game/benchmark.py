@@ -0,0 +1,130 @@
+import random
+import shutil
+import tempfile
+import time
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import F
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from assassin_game.models import Game, Post, UserGameStatus
+from assassin_game.synthetic import seed_game
+
+SCENARIOS = ('join', 'kill', 'feed')
+
+
+class Recorder(object):
+
+    def __init__(self):
+        self.times = []
+        self.queries = []
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def request(self, send):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.time()
+            response = send()
+            elapsed = time.time() - start
+        self.elapsed += elapsed
+        self.times.append(elapsed * 1000)
+        self.queries.append(len(queries))
+        if response.status_code >= 400:
+            self.errors += 1
+        return response
+
+    def report(self):
+        if not self.times:
+            return {'requests': 0}
+        times = sorted(self.times)
+        return {
+            'requests': len(times),
+            'errors': self.errors,
+            'requests_per_second': round(len(times) / self.elapsed, 1),
+            'p50_ms': round(times[len(times) // 2], 2),
+            'p99_ms': round(times[min(len(times) - 1, len(times) * 99 // 100)], 2),
+            'queries_per_request': round(sum(self.queries) / float(len(self.queries)), 2),
+        }
+
+
+# n new players join a game in registration, one request each
+def join_storm(client, recorder, n, prefix):
+    game = Game.objects.create(status='r', name='%s join game' % prefix, game_picture='game_pictures/synthetic.jpg')
+    username = '%s-join-%d-' % (prefix, game.id)
+    User.objects.bulk_create(User(username='%s%d' % (username, i)) for i in range(n))
+
+    for user in User.objects.filter(username__startswith=username):
+        client.force_authenticate(user)
+        recorder.request(lambda: client.post('/api/games/%d/join/' % game.id))
+
+
+# a living player posts a kill on their target, who verifies it. stops early when the game is won
+def kill_loop(client, recorder, game, n):
+    pending = set(Post.objects.filter(game=game, status='p').values_list('poster_id', 'killed_id'))
+
+    for _ in range(n):
+        # the last player standing targets themselves. chosen here rather than by the database so --seed repeats
+        hunters = list(UserGameStatus.objects.filter(game=game, status='a').exclude(target=F('user'))
+                       .order_by('id').values_list('pk', flat=True))
+        if not hunters:
+            break
+        killer = UserGameStatus.objects.select_related('user', 'target').get(pk=random.choice(hunters))
+        if (killer.user_id, killer.target_id) in pending:
+            pending.discard((killer.user_id, killer.target_id))
+            Post.objects.filter(poster=killer.user_id, killed=killer.target_id, status='p').update(status='d')
+
+        client.force_authenticate(killer.user)
+        video = SimpleUploadedFile('kill.mp4', b'\0' * 1024, content_type='video/mp4')
+        response = recorder.request(lambda: client.post('/api/posts/', {'game': game.id, 'post_video': video,
+                                                                        'caption': 'benchmark'}, format='multipart'))
+        if response.status_code != 201:
+            continue
+
+        client.force_authenticate(killer.target)
+        recorder.request(lambda: client.post('/api/posts/%d/verify/' % response.data['id']))
+
+
+# players open the feed and scroll a few pages down
+def feed_scroll(client, recorder, game, users, n, pages=4):
+    requests = 0
+    while requests < n:
+        client.force_authenticate(random.choice(users))
+        url = '/api/posts/feed/?game=%d' % game.id
+        for _ in range(pages):
+            response = recorder.request(lambda: client.get(url))
+            requests += 1
+            url = response.data.get('next') if response.status_code == 200 else None
+            if not url or requests >= n:
+                break
+
+
+# seeds one synthetic game and runs each scenario against it through the api, returning a report per scenario.
+# runs against whatever database is current, the management command gives it a throwaway test database
+def run(players=200, posts=1000, comments=2000, likes=5000, requests=200, scenarios=SCENARIOS, prefix='bench',
+        seed=0):
+    random.seed(seed)
+    client = APIClient()
+    media_root = tempfile.mkdtemp()
+
+    try:
+        with override_settings(MEDIA_ROOT=media_root):
+            start = time.time()
+            game, users = seed_game(players, posts, comments, prefix=prefix, likes=likes)
+            report = {'seed_seconds': round(time.time() - start, 2), 'scenarios': {}}
+
+            for name in scenarios:
+                recorder = Recorder()
+                if name == 'join':
+                    join_storm(client, recorder, requests, prefix)
+                elif name == 'kill':
+                    kill_loop(client, recorder, game, requests // 2)
+                elif name == 'feed':
+                    feed_scroll(client, recorder, game, users, requests)
+                else:
+                    raise ValueError('Unknown scenario %s' % name)
+                report['scenarios'][name] = recorder.report()
+    finally:
+        shutil.rmtree(media_root)
+    return report
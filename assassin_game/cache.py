@@ -0,0 +1,147 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+from assassin_game.models import Game, UserGameStatus, Post, Badge, Report
+from assassin_game.signals import ring_changed
+
+# a namespace version is the time of the last write that touched it. it is baked into every cache key and
+# ETag, so bumping it invalidates all cached responses of the namespace at once and doubles as Last-Modified
+INVALIDATES = {
+    Game: ('games', 'statuses'),
+    UserGameStatus: ('statuses',),
+    # creating and verifying posts moves statuses with queryset updates and awards badges with bulk inserts,
+    # neither of which send signals of their own
+    Post: ('statuses', 'badges'),
+    Badge: ('badges',),
+}
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def version_key(namespace):
+    return 'api-version:%s' % namespace
+
+
+def timeout():
+    return getattr(settings, 'API_CACHE_TIMEOUT', 300)
+
+
+# versions expire with the responses cached under them. a write made in another process (a management command, or
+# another worker when the cache is per process) never bumps this process's version, and a version that lived on
+# would keep answering 304 to clients for data that has changed
+def get_version(namespace):
+    version = get_cache().get(version_key(namespace))
+    if version is None:
+        version = time.time()
+        if not get_cache().add(version_key(namespace), version, timeout()):
+            version = get_cache().get(version_key(namespace), version)
+    return version
+
+
+def invalidate(*namespaces):
+    def bump():
+        get_cache().set_many({version_key(n): time.time() for n in namespaces}, timeout())
+
+    # bump again on commit, a reader may have cached the old rows between our write and its commit
+    bump()
+    transaction.on_commit(bump)
+
+
+def invalidate_on_write(sender, **kwargs):
+    invalidate(*INVALIDATES[sender])
+
+
+# connected per model. a post_delete receiver without a sender makes django give up fast deletes everywhere and
+# load every row it deletes, whatever the model
+for model in INVALIDATES:
+    post_save.connect(invalidate_on_write, sender=model)
+    post_delete.connect(invalidate_on_write, sender=model)
+
+
+# per game namespaces, for responses about a single game that shouldn't go stale whenever any game changes
+def game_namespace(game_id):
+    return 'game:%s' % game_id
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def invalidate_game(sender, instance, **kwargs):
+    invalidate(game_namespace(instance.pk))
+
+
+@receiver(post_save, sender=UserGameStatus)
+@receiver(post_delete, sender=UserGameStatus)
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_game_of(sender, instance, **kwargs):
+    invalidate(game_namespace(instance.game_id))
+
+
+@receiver(post_save, sender=Report)
+@receiver(post_delete, sender=Report)
+def invalidate_game_of_report(sender, instance, **kwargs):
+    game_id = Post.objects.filter(pk=instance.post_id).values_list('game_id', flat=True).first()
+    if game_id is not None:
+        invalidate(game_namespace(game_id))
+
+
+# the ring moves targets and statuses with queryset updates
+@receiver(ring_changed)
+def invalidate_ring(sender, game, **kwargs):
+    invalidate(game_namespace(game.pk), 'statuses')
+
+
+def digest(*parts):
+    return hashlib.md5(':'.join('%r' % (p,) for p in parts).encode('utf-8')).hexdigest()
+
+
+def not_modified(request, etag, last_modified):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        return if_none_match.strip() == '*' or etag in [e.strip() for e in if_none_match.split(',')]
+
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(last_modified) <= if_modified_since
+
+
+# read-only responses are cached per namespace version and answered with 304s when the client is current
+class CachedResponseMixin(object):
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(self.cache_namespace, super(CachedResponseMixin, self).list, request, *args,
+                                    **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(self.cache_namespace, super(CachedResponseMixin, self).retrieve, request, *args,
+                                    **kwargs)
+
+    def cached_response(self, namespace, view, request, *args, **kwargs):
+        version = get_version(namespace)
+        key = 'api-response:%s:%s' % (namespace, digest(version, request.get_full_path()))
+        etag = '"%s"' % digest(key, request.accepted_renderer.format)
+
+        if not_modified(request, etag, version):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            cached = get_cache().get(key)
+            if cached is not None:
+                response = Response(cached)
+            else:
+                response = view(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                get_cache().set(key, response.data, timeout())
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(version)
+        return response
@@ -0,0 +1,94 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from assassin_game.models import Comment, CommentLike, Like, Post, Report
+
+# row model -> (counted model, foreign key to it, counter column)
+COUNTERS = {
+    Like: (Post, 'post', 'like_count'),
+    Comment: (Post, 'post', 'comment_count'),
+    Report: (Post, 'post', 'report_count'),
+    CommentLike: (Comment, 'comment', 'like_count'),
+}
+
+
+# adds delta to the counter of each of the given objects in one UPDATE, safe against concurrent writers
+def bump(row_model, pks, delta):
+    model, _, column = COUNTERS[row_model]
+    counted = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        counted = counted.filter(**{column + '__gte': -delta})
+    return counted.update(**{column: F(column) + delta})
+
+
+local = threading.local()
+
+
+# holds back the counter changes of the rows saved and deleted inside the block and makes them on the way out, one
+# UPDATE per model and delta rather than one per row
+@contextmanager
+def batched():
+    if getattr(local, 'pending', None) is not None:
+        yield
+        return
+
+    local.pending = defaultdict(int)
+    try:
+        yield
+        pending = local.pending
+    finally:
+        local.pending = None
+
+    by_delta = defaultdict(list)
+    for (row_model, pk), delta in pending.items():
+        if delta:
+            by_delta[(row_model, delta)].append(pk)
+    for (row_model, delta), pks in by_delta.items():
+        bump(row_model, pks, delta)
+
+
+def count(row_model, instance, delta):
+    pk = getattr(instance, COUNTERS[row_model][1] + '_id')
+    pending = getattr(local, 'pending', None)
+    if pending is None:
+        bump(row_model, [pk], delta)
+    else:
+        pending[(row_model, pk)] += delta
+
+
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        count(sender, instance, 1)
+
+
+# queryset and admin deletes send this for every row too, so do cascades from deleting a user or a comment
+def count_deleted(sender, instance, **kwargs):
+    count(sender, instance, -1)
+
+
+# connected per model, like cache.invalidate_on_write, so deletes of every other model stay fast deletes
+for row_model in COUNTERS:
+    post_save.connect(count_created, sender=row_model)
+    post_delete.connect(count_deleted, sender=row_model)
+
+
+def count_subquery(model, field):
+    counts = (model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field)
+              .annotate(count=Count('pk')).values('count'))
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+# recounts every counter with one UPDATE per column, touching only the rows that drifted. returns
+# {(model name, column): rows fixed}
+def reconcile():
+    fixed = {}
+    for row_model, (model, field, column) in COUNTERS.items():
+        actual = count_subquery(row_model, field)
+        # the count is correlated in the WHERE as well as the SET, no list of drifted ids to outgrow sqlite's
+        # limit on query parameters
+        drifted = model.objects.exclude(**{column: actual})
+        fixed[(model.__name__, column)] = drifted.update(**{column: actual})
+    return fixed
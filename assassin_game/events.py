@@ -0,0 +1,178 @@
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from queue import Empty, Full, Queue
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.renderers import BaseRenderer
+from assassin_game.models import Comment, Post
+from assassin_game.signals import ring_changed
+
+KEEPALIVE = 15
+RETRY = 3000
+
+
+class Event(object):
+
+    def __init__(self, id, type, game, data, users=None):
+        self.id = id
+        self.type = type
+        self.game = game
+        self.data = data
+        # None goes to everyone watching the game, otherwise only to these user ids
+        self.users = users
+
+    def visible_to(self, user_id, game_id):
+        if game_id is not None and self.game != game_id:
+            return False
+        return self.users is None or user_id in self.users
+
+    def encode(self):
+        return 'id: %s\nevent: %s\ndata: %s\n\n' % (self.id, self.type, json.dumps(self.data))
+
+
+class Subscription(object):
+
+    def __init__(self, broker, user_id, game_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.game_id = game_id
+        self.queue = Queue(getattr(settings, 'EVENT_QUEUE_SIZE', 100))
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+# fans events out to the subscribers of this process. a deployment running several workers points EVENT_BROKER
+# at a class with the same subscribe/unsubscribe/publish methods backed by something shared
+class LocalBroker(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = set()
+        self.ids = itertools.count(1)
+        # ids are <epoch>-<n>, n restarts with the process and the epoch tells a Last-Event-ID from an earlier one
+        self.epoch = '%x' % int(time.time() * 1000)
+        # recent events, so a client that reconnects with Last-Event-ID doesn't miss what happened in between
+        self.history = deque(maxlen=getattr(settings, 'EVENT_HISTORY_SIZE', 256))
+
+    # the events after last_event_id in this process. everything here happened after an id from an earlier process,
+    # so the client gets all of it. raises ValueError for an id that isn't one of ours
+    def since(self, last_event_id):
+        epoch, n = last_event_id.split('-')
+        n = int(n)
+        return n if epoch == self.epoch else 0
+
+    def subscribe(self, user_id, game_id=None, last_event_id=None):
+        after = self.since(last_event_id) if last_event_id is not None else None
+        subscription = Subscription(self, user_id, game_id)
+        with self.lock:
+            self.subscriptions.add(subscription)
+            if after is not None:
+                for n, event in self.history:
+                    if n > after and event.visible_to(user_id, game_id):
+                        self.deliver(subscription, event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def publish(self, type, game, data, users=None):
+        with self.lock:
+            n = next(self.ids)
+            event = Event('%s-%d' % (self.epoch, n), type, game, data, users)
+            self.history.append((n, event))
+            for subscription in self.subscriptions:
+                if event.visible_to(subscription.user_id, subscription.game_id):
+                    self.deliver(subscription, event)
+        return event
+
+    def deliver(self, subscription, event):
+        # a client that stops reading loses events instead of growing the queue, it resyncs with a normal request
+        try:
+            subscription.queue.put_nowait(event)
+        except Full:
+            pass
+
+
+broker = None
+broker_lock = threading.Lock()
+
+
+# two threads racing here would each build a broker, and whatever was published to the losing one never arrives
+def get_broker():
+    global broker
+    if broker is None:
+        with broker_lock:
+            if broker is None:
+                broker = import_string(getattr(settings, 'EVENT_BROKER', 'assassin_game.events.LocalBroker'))()
+    return broker
+
+
+# events describe committed rows only, a rolled back verify never reaches a client
+def publish(type, game, data, users=None):
+    transaction.on_commit(lambda: get_broker().publish(type, game, data, users))
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    data = {'post': instance.pk, 'poster': instance.poster_id, 'killed': instance.killed_id,
+            'status': instance.status}
+    publish('post_created' if created else 'post_updated', instance.game_id, data)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        game_id = Post.objects.filter(pk=instance.post_id).values_list('game_id', flat=True).first()
+        publish('comment_created', game_id, {'comment': instance.pk, 'post': instance.post_id,
+                                             'commenter': instance.commenter_id})
+
+
+# nobody but the player themselves learns who they are hunting
+@receiver(ring_changed)
+def ring_updated(sender, game, targets, statuses, **kwargs):
+    for user_id, target_id in targets.items():
+        publish('target_assigned', game.pk, {'user': user_id, 'target': target_id}, users={user_id})
+    for user_id, status in statuses.items():
+        publish('status_changed', game.pk, {'user': user_id, 'status': status}, users={user_id})
+
+
+# lets clients send Accept: text/event-stream, errors before the stream starts are written as plain json
+class EventStreamRenderer(BaseRenderer):
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode('utf-8') if data is not None else b''
+
+
+# the text/event-stream body. the view subscribes before returning it and the WSGI server calls close() when the
+# client goes away, which drops the subscription
+class EventStream(object):
+
+    def __init__(self, subscription, keepalive=KEEPALIVE):
+        self.subscription = subscription
+        self.keepalive = keepalive
+
+    def __iter__(self):
+        yield 'retry: %d\n\n' % RETRY
+        while True:
+            event = self.subscription.get(self.keepalive)
+            yield event.encode() if event is not None else ': keepalive\n\n'
+
+    def close(self):
+        self.subscription.close()
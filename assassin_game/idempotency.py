@@ -0,0 +1,56 @@
+import json
+from functools import wraps
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from assassin_game.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+
+
+def replay(stored, request):
+    if stored.method != request.method or stored.path != request.path:
+        return Response({"Error": "Idempotency key was already used for another request"},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    response = Response(json.loads(stored.response), status=stored.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+# wraps a view method so a retried request carrying the same Idempotency-Key replays the first response
+# instead of running again. the view and the stored key commit together, so a lost race just rolls back
+def idempotent(view):
+    @wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        user = request.user
+        if not key or not user.is_authenticated():
+            return view(self, request, *args, **kwargs)
+
+        stored = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if stored is not None:
+            return replay(stored, request)
+
+        try:
+            with transaction.atomic():
+                # the key goes in before the view runs so the transaction starts with a write, which on sqlite
+                # locks the database before the view reads anything
+                stored = IdempotencyKey.objects.create(user=user, key=key, method=request.method, path=request.path,
+                                                       status_code=0, response='')
+                response = view(self, request, *args, **kwargs)
+                if response.status_code < 500:
+                    stored.status_code = response.status_code
+                    stored.response = json.dumps(response.data, cls=JSONEncoder)
+                    stored.save(update_fields=['status_code', 'response'])
+                else:
+                    stored.delete()
+                return response
+        except IntegrityError:
+            stored = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if stored is None:
+                raise
+            return replay(stored, request)
+
+    return wrapper
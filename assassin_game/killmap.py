@@ -0,0 +1,75 @@
+import math
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.dispatch import receiver
+from assassin_game.models import KillCell, Post
+from assassin_game.signals import post_verified
+
+
+# grid zooms that get cells. a square at zoom z is 360 / 2**z degrees wide, about 600m at 16
+def zooms():
+    return getattr(settings, 'KILL_MAP_ZOOMS', (10, 13, 16))
+
+
+def cell_size(zoom):
+    return 360.0 / 2 ** zoom
+
+
+def cell(zoom, latitude, longitude):
+    size = cell_size(zoom)
+    return int(math.floor((longitude + 180) / size)), int(math.floor((latitude + 90) / size))
+
+
+# the finest grid no more than two zooms below what the map shows, so a screen holds a few hundred cells at most
+def grid_for(zoom):
+    return max([z for z in zooms() if z <= zoom + 2] or [min(zooms())])
+
+
+@receiver(post_verified)
+def record_kill(sender, post, **kwargs):
+    for zoom in zooms():
+        x, y = cell(zoom, post.latitude, post.longitude)
+        cells = KillCell.objects.filter(game=post.game_id, zoom=zoom, x=x, y=y)
+        bump = {'kills': F('kills') + 1, 'latitude_sum': F('latitude_sum') + post.latitude,
+                'longitude_sum': F('longitude_sum') + post.longitude}
+        if not cells.update(**bump):
+            try:
+                with transaction.atomic():
+                    KillCell.objects.create(game_id=post.game_id, zoom=zoom, x=x, y=y, kills=1,
+                                            latitude_sum=post.latitude, longitude_sum=post.longitude)
+            except IntegrityError:
+                cells.update(**bump)
+
+
+# recounts every cell of the game from its verified posts in one streaming pass
+def rebuild(game):
+    with transaction.atomic():
+        KillCell.objects.filter(game=game).delete()
+
+        cells = {}
+        kills = Post.objects.filter(game=game, status='v').values_list('latitude', 'longitude')
+        for latitude, longitude in kills.iterator():
+            for zoom in zooms():
+                key = (zoom,) + cell(zoom, latitude, longitude)
+                if key not in cells:
+                    cells[key] = KillCell(game=game, zoom=zoom, x=key[1], y=key[2])
+                cells[key].kills += 1
+                cells[key].latitude_sum += latitude
+                cells[key].longitude_sum += longitude
+
+        KillCell.objects.bulk_create(cells.values(), batch_size=500)
+        return len(cells)
+
+
+def cells_in(game, zoom, south, west, north, east):
+    grid = grid_for(zoom)
+    min_x, min_y = cell(grid, south, west)
+    max_x, max_y = cell(grid, north, east)
+    return grid, KillCell.objects.filter(game=game, zoom=grid, x__gte=min_x, x__lte=max_x, y__gte=min_y,
+                                         y__lte=max_y)
+
+
+def kills_in(game, south, west, north, east):
+    return Post.objects.filter(game=game, status='v', latitude__gte=south, latitude__lte=north,
+                               longitude__gte=west, longitude__lte=east)
@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models import F
+from assassin_game.models import LeaderboardEntry, Post, UserGameStatus
+
+# ranks are standard competition ranks (1, 2, 2, 4): one plus the number of players with strictly more kills
+
+
+def add_player(game, user):
+    rank = LeaderboardEntry.objects.filter(game=game, kills__gt=0).count() + 1
+    return LeaderboardEntry.objects.create(game=game, user=user, rank=rank)
+
+
+# must run in the transaction that verifies the post so the board never disagrees with the ring
+def record_kill(post):
+    with transaction.atomic():
+        entries = {e.user_id: e for e in LeaderboardEntry.objects.select_for_update()
+                   .filter(game=post.game_id, user__in=[post.poster_id, post.killed_id])}
+        if len(entries) < len({post.poster_id, post.killed_id}):
+            # players from before the leaderboard existed, the rebuild picks this kill up too
+            return rebuild(post.game)
+
+        killer = entries[post.poster_id]
+        kills = killer.kills
+
+        LeaderboardEntry.objects.filter(game=post.game_id, kills=kills).exclude(pk=killer.pk).update(rank=F('rank') + 1)
+        killer.kills = kills + 1
+        killer.last_kill_time = post.time_confirmed
+        killer.rank = LeaderboardEntry.objects.filter(game=post.game_id, kills__gt=killer.kills).count() + 1
+        killer.save(update_fields=['kills', 'last_kill_time', 'rank'])
+
+        LeaderboardEntry.objects.filter(game=post.game_id, user=post.killed_id).update(alive=False)
+        return killer
+
+
+# recomputes the whole board for a game from the verified posts
+def rebuild(game):
+    with transaction.atomic():
+        LeaderboardEntry.objects.filter(game=game).delete()
+
+        entries = {}
+        for user_id, user_status in UserGameStatus.objects.filter(game=game).values_list('user_id', 'status'):
+            entries[user_id] = LeaderboardEntry(game=game, user_id=user_id, alive=user_status != 'd')
+
+        verified = Post.objects.filter(game=game, status='v').values_list('poster_id', 'time_confirmed')
+        for poster_id, time_confirmed in verified.iterator():
+            entry = entries.setdefault(poster_id, LeaderboardEntry(game=game, user_id=poster_id, alive=False))
+            entry.kills += 1
+            if entry.last_kill_time is None or time_confirmed > entry.last_kill_time:
+                entry.last_kill_time = time_confirmed
+
+        ranked = sorted(entries.values(), key=lambda e: -e.kills)
+        for i, entry in enumerate(ranked):
+            if i > 0 and entry.kills == ranked[i - 1].kills:
+                entry.rank = ranked[i - 1].rank
+            else:
+                entry.rank = i + 1
+
+        LeaderboardEntry.objects.bulk_create(ranked)
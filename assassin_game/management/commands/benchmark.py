@@ -0,0 +1,62 @@
+import json
+import subprocess
+from django.core.management.base import BaseCommand
+from django.test.utils import (setup_databases, setup_test_environment, teardown_databases,
+                               teardown_test_environment)
+from assassin_game import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Seeds a synthetic game in a throwaway test database, drives join, kill/verify and feed traffic through '
+            'the api and prints requests/s, p50/p99 latency and queries per request as json')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--likes', type=int, default=5000)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+        parser.add_argument('--scenario', action='append', choices=benchmark.SCENARIOS,
+                            help='Scenario to run, may be repeated (default: all)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, keep it fixed to compare commits')
+        parser.add_argument('--output', help='Also write the report to this file')
+        parser.add_argument('--baseline', help='Report from an earlier run to compare against')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            report = benchmark.run(options['players'], options['posts'], options['comments'], options['likes'],
+                                   options['requests'], options['scenario'] or benchmark.SCENARIOS,
+                                   seed=options['seed'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report['commit'] = self.commit()
+        report['options'] = {k: options[k] for k in ('players', 'posts', 'comments', 'likes', 'requests', 'seed')}
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                report['change'] = self.compare(json.load(f), report)
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+
+    def commit(self):
+        try:
+            return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                           stderr=subprocess.DEVNULL).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    # relative change of every metric against the baseline, +0.1 is 10% more
+    def compare(self, baseline, report):
+        change = {}
+        for name, metrics in report['scenarios'].items():
+            before = baseline.get('scenarios', {}).get(name, {})
+            change[name] = {key: round(value / float(before[key]) - 1, 3)
+                            for key, value in metrics.items() if before.get(key)}
+        return change
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from assassin_game.models import Game
+from assassin_game import ring
+
+
+class Command(BaseCommand):
+    help = 'Checks that the living players of every game form a single target ring'
+
+    def add_arguments(self, parser):
+        parser.add_argument('game_ids', nargs='*', type=int)
+
+    def handle(self, *args, **options):
+        games = Game.objects.exclude(status='c')
+        if options['game_ids']:
+            games = Game.objects.filter(pk__in=options['game_ids'])
+
+        for game in games:
+            errors = ring.check_integrity(game)
+            if errors:
+                self.stdout.write(self.style.ERROR('%s: ring is broken' % game))
+                for error in errors:
+                    self.stdout.write('    %s' % error)
+            else:
+                self.stdout.write(self.style.SUCCESS('%s: ring is intact' % game))
@@ -0,0 +1,60 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from assassin_game.models import Post, Comment, UserGameStatus
+from assassin_game.synthetic import seed_game
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Seeds a synthetic game and prints the query plan and timing of every game-logic lookup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=10000)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic game instead of rolling it back')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                start = time.time()
+                game, users = seed_game(options['players'], options['posts'], options['comments'])
+                self.stdout.write('Seeded %d players in %.2fs' % (len(users), time.time() - start))
+
+                for name, queryset in self.lookups(game, users):
+                    self.explain(name, queryset)
+
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            pass
+
+    def lookups(self, game, users):
+        killer, victim = users[len(users) // 2], users[len(users) // 2 + 1]
+        post = Post.objects.filter(game=game).order_by('id').first()
+        return [
+            ('verify: assassin of victim', UserGameStatus.objects.filter(target=victim, game=game, status='a')),
+            ('verify: victim status', UserGameStatus.objects.filter(user=victim, game=game)),
+            ('create: pending kill', Post.objects.filter(poster=killer, killed=victim, status='p')),
+            ('feed: verified kills', Post.objects.filter(game=game, status='v').order_by('-time_confirmed')[:25]),
+            ('comments: by post', Comment.objects.filter(post=post).order_by('time')),
+        ]
+
+    def explain(self, name, queryset):
+        sql, params = queryset.query.sql_with_params()
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            plan = cursor.fetchall()
+
+        start = time.time()
+        list(queryset)
+        elapsed = (time.time() - start) * 1000
+
+        self.stdout.write('\n%s (%.2fms)' % (name, elapsed))
+        for row in plan:
+            self.stdout.write('    %s' % row[-1])
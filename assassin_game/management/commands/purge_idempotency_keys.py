@@ -0,0 +1,16 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from assassin_game.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Deletes stored idempotency keys older than the given number of hours'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        deleted, _ = IdempotencyKey.objects.filter(created__lt=cutoff).delete()
+        self.stdout.write('Deleted %d idempotency keys' % deleted)
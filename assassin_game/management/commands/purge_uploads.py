@@ -0,0 +1,25 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from assassin_game.models import Upload
+from assassin_game import uploads
+
+
+class Command(BaseCommand):
+    help = ('Deletes uploads older than the given number of hours along with their files: unfinished ones, and '
+            'finished ones that never got attached to a post')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = Upload.objects.filter(created__lt=cutoff)
+        for upload in stale:
+            if upload.status == 'u':
+                uploads.discard(upload)
+            # creating a post deletes its upload and keeps the file, so a complete upload still here was abandoned
+            elif upload.file:
+                upload.file.delete(save=False)
+        deleted, _ = stale.delete()
+        self.stdout.write('Deleted %d stale uploads' % deleted)
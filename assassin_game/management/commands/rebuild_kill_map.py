@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from assassin_game.models import Game
+from assassin_game import killmap
+
+
+class Command(BaseCommand):
+    help = 'Recounts the kill map cells of the given games (all games by default) from their verified posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('game_ids', nargs='*', type=int)
+
+    def handle(self, *args, **options):
+        games = Game.objects.all()
+        if options['game_ids']:
+            games = games.filter(pk__in=options['game_ids'])
+
+        for game in games:
+            self.stdout.write('Rebuilt %d kill map cells for %s' % (killmap.rebuild(game), game))
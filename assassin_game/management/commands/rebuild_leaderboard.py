@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from assassin_game.models import Game
+from assassin_game import cache, leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the leaderboard of the given games (all games by default) from their verified posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('game_ids', nargs='*', type=int)
+
+    def handle(self, *args, **options):
+        games = Game.objects.all()
+        if options['game_ids']:
+            games = games.filter(pk__in=options['game_ids'])
+
+        for game in games:
+            leaderboard.rebuild(game)
+            # the stats endpoint shows the top killers
+            cache.invalidate(cache.game_namespace(game.pk))
+            self.stdout.write('Rebuilt leaderboard for %s' % game)
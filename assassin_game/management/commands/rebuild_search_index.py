@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from assassin_game import search
+
+
+class Command(BaseCommand):
+    help = 'Recreates the full-text search tables and triggers and fills them from users, posts and comments'
+
+    def handle(self, *args, **options):
+        if search.install():
+            self.stdout.write('Rebuilt the search index')
+        else:
+            self.stdout.write('This database has no FTS5, searches use LIKE')
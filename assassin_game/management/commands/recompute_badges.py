@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from assassin_game.models import Game
+from assassin_game import badges, cache
+
+
+class Command(BaseCommand):
+    help = 'Recomputes every earned badge of a game in one pass over its verified posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('game_id', type=int)
+
+    def handle(self, *args, **options):
+        try:
+            game = Game.objects.get(pk=options['game_id'])
+        except Game.DoesNotExist:
+            raise CommandError('Game %s does not exist' % options['game_id'])
+
+        awarded = badges.recompute(game)
+        cache.invalidate('badges')
+        self.stdout.write(self.style.SUCCESS('Awarded %d badges in %s' % (len(awarded), game)))
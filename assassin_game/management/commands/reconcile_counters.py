@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from assassin_game import counters
+
+
+class Command(BaseCommand):
+    help = 'Recounts the like, comment and report counters of every post and comment and fixes any that drifted'
+
+    def handle(self, *args, **options):
+        for (model, column), fixed in sorted(counters.reconcile().items()):
+            self.stdout.write('%s.%s: fixed %d' % (model, column, fixed))
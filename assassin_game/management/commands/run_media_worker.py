@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from assassin_game import processing
+
+
+class Command(BaseCommand):
+    help = 'Processes queued media jobs (thumbnails, image renditions, web videos) off the request path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            job = processing.claim()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+
+            start = time.time()
+            if processing.run(job):
+                self.stdout.write('%s done in %.2fs' % (job, time.time() - start))
+            else:
+                job.refresh_from_db()
+                self.stdout.write(self.style.ERROR('%s: %s' % (job, job.error)))
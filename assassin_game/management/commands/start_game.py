@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from assassin_game.models import Game
+from assassin_game import ring
+
+
+class Command(BaseCommand):
+    help = 'Starts a game in registration and randomly assigns every target in one transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('game_id', type=int)
+
+    def handle(self, *args, **options):
+        try:
+            game = Game.objects.get(pk=options['game_id'])
+        except Game.DoesNotExist:
+            raise CommandError('Game %s does not exist' % options['game_id'])
+
+        start = time.time()
+        try:
+            game, statuses = ring.start(game)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS('Started %s with %d players in %.2fs'
+                                             % (game, len(statuses), time.time() - start)))
@@ -0,0 +1,132 @@
+import mimetypes
+import os
+import re
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe, urlquote
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+
+# yields length bytes of f starting at offset, so a seek in the app only costs the bytes it asks for
+class RangeFileWrapper(object):
+
+    def __init__(self, f, offset, length):
+        self.f = f
+        self.f.seek(offset)
+        self.remaining = length
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.remaining <= 0:
+            raise StopIteration
+        data = self.f.read(min(BLOCK_SIZE, self.remaining))
+        if not data:
+            raise StopIteration
+        self.remaining -= len(data)
+        return data
+
+    next = __next__
+
+    def close(self):
+        self.f.close()
+
+
+# returns (start, end) inclusive, None to send the whole file, or False when the range can't be satisfied
+def parse_range(header, size):
+    match = RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def range_still_valid(request, etag, mtime):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+# the web server streams the file itself, Range requests included, and the worker is free straight away
+def sendfile_response(path, fullpath, content_type):
+    backend = getattr(settings, 'MEDIA_SENDFILE_BACKEND', None)
+    if backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = fullpath
+    elif backend == 'x-accel-redirect':
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = prefix + urlquote(path)
+    else:
+        return None
+    return response
+
+
+@require_safe
+def serve(request, path):
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    stat = os.stat(fullpath)
+    etag = '"%x-%x"' % (int(stat.st_mtime), stat.st_size)
+    content_type = mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        not_modified = etag in [e.strip() for e in if_none_match.split(',')]
+    else:
+        not_modified = not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime,
+                                              stat.st_size)
+    if not_modified:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    response = sendfile_response(path, fullpath, content_type)
+    if response is None:
+        byte_range = None
+        if range_still_valid(request, etag, stat.st_mtime):
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), stat.st_size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */%d' % stat.st_size
+        elif byte_range is not None:
+            start, end = byte_range
+            response = StreamingHttpResponse(RangeFileWrapper(open(fullpath, 'rb'), start, end - start + 1),
+                                             status=206, content_type=content_type)
+            response['Content-Range'] = 'bytes %d-%d/%d' % (start, end, stat.st_size)
+            response['Content-Length'] = end - start + 1
+        else:
+            # FileResponse hands the file to wsgi.file_wrapper, which uses sendfile(2) where the server supports it
+            response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+            response['Content-Length'] = stat.st_size
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
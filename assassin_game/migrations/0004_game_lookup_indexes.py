@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 10:59
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assassin_game', '0003_report'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'time'], name='assassin_ga_post_id_fd5dd3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['poster', 'killed', 'status'], name='assassin_ga_poster__6eecee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['game', 'status', 'time_confirmed'], name='assassin_ga_game_id_2a3972_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usergamestatus',
+            index=models.Index(fields=['target', 'game', 'status'], name='assassin_ga_target__ad98c9_idx'),
+        ),
+    ]
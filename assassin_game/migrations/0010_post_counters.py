@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 11:13
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count(model, field):
+    counts = (model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field)
+              .annotate(count=Count('pk')).values('count'))
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('assassin_game', 'Post')
+    Comment = apps.get_model('assassin_game', 'Comment')
+    Post.objects.update(like_count=count(apps.get_model('assassin_game', 'Like'), 'post'),
+                        comment_count=count(Comment, 'post'),
+                        report_count=count(apps.get_model('assassin_game', 'Report'), 'post'))
+    Comment.objects.update(like_count=count(apps.get_model('assassin_game', 'CommentLike'), 'comment'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assassin_game', '0009_mediajob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='report_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 11:18
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assassin_game', '0010_post_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KillCell',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.PositiveSmallIntegerField()),
+                ('x', models.IntegerField()),
+                ('y', models.IntegerField()),
+                ('kills', models.PositiveIntegerField(default=0)),
+                ('latitude_sum', models.FloatField(default=0)),
+                ('longitude_sum', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['game', 'latitude', 'longitude'], name='assassin_ga_game_id_cb1c7b_idx'),
+        ),
+        migrations.AddField(
+            model_name='killcell',
+            name='game',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kill_cells', to='assassin_game.Game'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='killcell',
+            unique_together=set([('game', 'zoom', 'x', 'y')]),
+        ),
+    ]
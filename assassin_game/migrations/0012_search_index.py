@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+# sqlite only, other databases search with LIKE
+def install(apps, schema_editor):
+    from assassin_game import search
+    search.install(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    from assassin_game import search
+    if search.fts5_available(schema_editor.connection):
+        search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0008_alter_user_username_max_length'),
+        ('assassin_game', '0011_killcell'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
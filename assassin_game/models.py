@@ -1,5 +1,8 @@
+import uuid
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
 
 
 class Player(models.Model):
@@ -31,7 +34,9 @@ class Post(models.Model):
     killed = models.ForeignKey(User, on_delete=models.CASCADE)
     game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name="posts")
     post_video = models.FileField(upload_to='post_videos/')
-    post_thumbnail_image = models.ImageField(upload_to='post_thumbnail_image/')
+    # generated by the media worker when the client doesn't send one
+    post_thumbnail_image = models.ImageField(upload_to='post_thumbnail_image/', blank=True)
+    web_video = models.FileField(upload_to='post_videos/web/', blank=True)
     caption = models.TextField(default="")
     latitude = models.FloatField(default=34.140808)
     longitude = models.FloatField(default=-118.412303)
@@ -45,17 +50,28 @@ class Post(models.Model):
 
     status = models.CharField(max_length=1, choices=POST_STATUS_CHOICE)
     time_confirmed = models.DateTimeField()
+    # kept up to date by assassin_game.counters, manage.py reconcile_counters repairs any drift
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    report_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return "%s killed %s" % (self.poster, self.killed)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['poster', 'killed', 'status']),
+            models.Index(fields=['game', 'status', 'time_confirmed']),
+            models.Index(fields=['game', 'latitude', 'longitude']),
+        ]
+
 
 class Like(models.Model):
     post = models.ForeignKey(Post, related_name="likes", on_delete=models.CASCADE)
     liker = models.ForeignKey(User, on_delete=models.CASCADE)
 
     def __str__(self):
-        return "%s liked Post %s" % (self.liker, self.post.id)
+        return "%s liked Post %s" % (self.liker, self.post_id)
 
     class Meta:
         unique_together = ('post', 'liker',)
@@ -66,9 +82,15 @@ class Comment(models.Model):
     commenter = models.ForeignKey(User, related_name="comments", on_delete=models.CASCADE)
     text = models.TextField()
     time = models.DateTimeField(auto_now_add=True)
+    like_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
-        return '%s (Post %s): %s' % (self.commenter, self.post.id, self.text)
+        return '%s (Post %s): %s' % (self.commenter, self.post_id, self.text)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'time']),
+        ]
 
 
 class CommentLike(models.Model):
@@ -76,7 +98,7 @@ class CommentLike(models.Model):
     liker = models.ForeignKey(User, on_delete=models.CASCADE)
 
     def __str__(self):
-        return "%s liked Comment %s" % (self.liker, self.comment.id)
+        return "%s liked Comment %s" % (self.liker, self.comment_id)
 
     class Meta:
         unique_together = ('comment', 'liker',)
@@ -96,10 +118,13 @@ class UserGameStatus(models.Model):
     status = models.CharField(max_length=1, choices=USER_STATUS_CHOICE)
 
     def __str__(self):
-        return "%s (Game %s): %s" % (self.user, self.game.id, self.status)
+        return "%s (Game %s): %s" % (self.user, self.game_id, self.status)
 
     class Meta:
         unique_together = ('user', 'game',)
+        indexes = [
+            models.Index(fields=['target', 'game', 'status']),
+        ]
 
 
 class Badge(models.Model):
@@ -119,7 +144,7 @@ class Badge(models.Model):
     type = models.CharField(max_length=1, choices=BADGE_TYPE_CHOICE)
 
     def __str__(self):
-        return "%s (Game %s): %s" % (self.type, self.game.id, self.type)
+        return "%s (Game %s): %s" % (self.type, self.game_id, self.type)
 
 
 class Report(models.Model):
@@ -127,7 +152,131 @@ class Report(models.Model):
     reporter = models.ForeignKey(User, on_delete=models.CASCADE)
 
     def __str__(self):
-        return "%s reported Post %s" % (self.reporter, self.post.id)
+        return "%s reported Post %s" % (self.reporter, self.post_id)
+
+    class Meta:
+        unique_together = ('reporter', 'post',)
+
+
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="idempotency_keys")
+    key = models.CharField(max_length=255)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.TextField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return "%s %s %s (%s)" % (self.key, self.method, self.path, self.status_code)
+
+    class Meta:
+        unique_together = ('user', 'key',)
+
+
+class LeaderboardEntry(models.Model):
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name="leaderboard")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="leaderboard_entries")
+    kills = models.PositiveIntegerField(default=0)
+    last_kill_time = models.DateTimeField(null=True, blank=True)
+    alive = models.BooleanField(default=True)
+    rank = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return "%s (Game %s): #%s with %s kills" % (self.user, self.game_id, self.rank, self.kills)
+
+    class Meta:
+        unique_together = ('game', 'user',)
+        indexes = [
+            models.Index(fields=['game', 'rank']),
+            models.Index(fields=['game', 'kills']),
+        ]
+
+
+class DailyKillCount(models.Model):
+    game = models.ForeignKey(Game, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="daily_kill_counts")
+    day = models.DateField()
+    kills = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return "%s (Game %s) %s: %s kills" % (self.user, self.game_id, self.day, self.kills)
+
+    class Meta:
+        unique_together = ('game', 'user', 'day',)
+
+
+# verified kills of a game counted per square of a fixed lat/long grid, one grid per zoom in
+# assassin_game.killmap.ZOOMS, so the map can draw a heatmap without reading the posts
+class KillCell(models.Model):
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name="kill_cells")
+    zoom = models.PositiveSmallIntegerField()
+    x = models.IntegerField()
+    y = models.IntegerField()
+    kills = models.PositiveIntegerField(default=0)
+    # sums rather than means so a kill is added with one F() update, the cell is drawn at their centroid
+    latitude_sum = models.FloatField(default=0)
+    longitude_sum = models.FloatField(default=0)
+
+    def __str__(self):
+        return "Game %s zoom %s (%s, %s): %s kills" % (self.game_id, self.zoom, self.x, self.y, self.kills)
+
+    class Meta:
+        unique_together = ('game', 'zoom', 'x', 'y',)
+
+
+class Upload(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="uploads")
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    file = models.FileField(upload_to='post_videos/', blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    UPLOAD_STATUS_CHOICE = (
+        ('u', "Uploading"),
+        ('c', "Complete"),
+    )
+
+    status = models.CharField(max_length=1, choices=UPLOAD_STATUS_CHOICE, default='u')
+
+    def __str__(self):
+        return "%s (%s/%s bytes)" % (self.filename, self.offset, self.size)
+
+
+class MediaJob(models.Model):
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    target = GenericForeignKey('content_type', 'object_id')
+    field = models.CharField(max_length=64)
+
+    JOB_KIND_CHOICE = (
+        ('t', "Video thumbnail"),
+        ('v', "Web video"),
+        ('i', "Image renditions"),
+    )
+
+    kind = models.CharField(max_length=1, choices=JOB_KIND_CHOICE)
+
+    JOB_STATUS_CHOICE = (
+        ('q', "Queued"),
+        ('r', "Running"),
+        ('d', "Done"),
+        ('f', "Failed"),
+    )
+
+    status = models.CharField(max_length=1, choices=JOB_STATUS_CHOICE, default='q')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return "%s %s %s.%s (%s)" % (self.get_kind_display(), self.content_type.model, self.object_id, self.field,
+                                      self.get_status_display())
 
     class Meta:
-        unique_together = ('reporter', 'post',)
\ No newline at end of file
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from assassin_game import leaderboard, ring
+from assassin_game.models import Post, UserGameStatus
+from assassin_game.signals import post_verified
+
+
+def report_threshold():
+    return getattr(settings, 'MODERATION_REPORT_THRESHOLD', 3)
+
+
+# conflicting posts waiting on an admin, plus anything reported often enough that it should be looked at
+def queue():
+    return Post.objects.filter(Q(status='c') | Q(report_count__gte=report_threshold())).exclude(status='d')
+
+
+# resolves the conflicting posts among post_ids in one transaction and returns the ones it changed. verifying
+# takes each game's killed players out of the ring in one batch, then records every kill the way admin_verify
+# does so the leaderboard and badges don't fall behind
+@transaction.atomic
+def resolve(post_ids, verify):
+    # claimed with a conditional UPDATE before anything is read, like PostViewSet.transition, so a racing
+    # admin_verify waits for the write lock instead of both reading first and deadlocking on sqlite
+    claimed = Post.objects.filter(pk__in=post_ids, status='c')
+    if not claimed.update(status='c'):
+        return []
+    posts = list(claimed.select_related('game', 'killed').order_by('time_confirmed', 'id'))
+    if verify:
+        posts = still_alive(posts)
+    if not posts:
+        return posts
+
+    if verify:
+        games = {}
+        for post in posts:
+            games.setdefault(post.game_id, (post.game, []))[1].append(post.killed)
+        for game, killed in games.values():
+            ring.remove_many(game, killed)
+    else:
+        # only pending players come back to life, they may have been killed by another post since
+        revived = Q()
+        for post in posts:
+            revived |= Q(user=post.killed_id, game=post.game_id)
+        UserGameStatus.objects.filter(revived, status='p').update(status='a')
+
+    now = timezone.now()
+    for post in posts:
+        post.status = 'v' if verify else 'd'
+        if verify:
+            post.time_confirmed = now
+        post.save()
+        if verify:
+            leaderboard.record_kill(post)
+            post_verified.send(sender=Post, post=post)
+    return posts
+
+
+# the posts whose killed player is still alive, first post per player. a player killed by another post since, or
+# by an earlier post in the same batch, can't die a second time and the post stays conflicting
+def still_alive(posts):
+    killed = Q()
+    for post in posts:
+        killed |= Q(user=post.killed_id, game=post.game_id)
+    alive = set(UserGameStatus.objects.filter(killed, status__in=ring.LIVING).values_list('game_id', 'user_id'))
+
+    kept = []
+    for post in posts:
+        if (post.game_id, post.killed_id) in alive:
+            alive.discard((post.game_id, post.killed_id))
+            kept.append(post)
+    return kept
@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class IdCursorPagination(CursorPagination):
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+
+# DRF's cursor only holds the first ordering field and falls back to an offset for rows that tie on it. this one
+# holds every ordering field and pages with (a, b) > (x, y) comparisons, so a page can end inside a tie. the
+# ordering has to end in a unique field and none of its fields can be null
+class KeysetCursorPagination(IdCursorPagination):
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.fields = [queryset.model._meta.get_field(order.lstrip('-')) for order in self.ordering]
+
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor is not None else None
+
+        ordering = [order[1:] if order.startswith('-') else '-' + order for order in self.ordering] \
+            if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(self.parse_position(position), ordering))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+
+        self.has_next = position is not None if reverse else more
+        self.has_previous = more if reverse else position is not None
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    # rows strictly past values in ordering: (a > x) or (a = x and b > y) or ..., < for descending fields
+    def after(self, values, ordering):
+        condition = Q()
+        for i, order in enumerate(ordering):
+            ties = {o.lstrip('-'): v for o, v in zip(ordering[:i], values[:i])}
+            ties[order.lstrip('-') + ('__lt' if order.startswith('-') else '__gt')] = values[i]
+            condition |= Q(**ties)
+        return condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = [field.value_from_object(instance) for field in self.fields]
+        return ','.join(v.isoformat() if isinstance(v, datetime) else str(v) for v in values)
+
+    def parse_position(self, position):
+        try:
+            values = [field.to_python(v) for field, v in zip(self.fields, position.split(','))]
+        except ValidationError:
+            values = []
+        if len(values) != len(self.fields) or None in values:
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    # the position of a row is unique, so the cursor is always the first or last row of the page and never needs an
+    # offset. past either end of the list a page comes back empty and the way back starts from the other end
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+
+# time_confirmed moves forward when a kill gets verified and many posts can share one, so it's paged together with
+# the id
+class FeedCursorPagination(KeysetCursorPagination):
+    ordering = ('-time_confirmed', '-id')
+
+
+# the rank order (ranks follow kills), paged on kills rather than rank: ranks tie, and every kill moves a whole block
+# of them at once
+class LeaderboardCursorPagination(KeysetCursorPagination):
+    ordering = ('-kills', 'id')
+
+
+# oldest first, the moderation queue is worked through in the order posts came in
+class ModerationCursorPagination(KeysetCursorPagination):
+    ordering = ('time_confirmed', 'id')
+
+
+# "<microseconds since epoch>-<id>", a position in a (time, id) ordering that survives two rows sharing a time
+def time_cursor(time, pk):
+    delta = time - EPOCH
+    return '%d-%d' % ((delta.days * 86400 + delta.seconds) * 10 ** 6 + delta.microseconds, pk)
+
+
+# (time, id), or None when the cursor doesn't parse
+def parse_time_cursor(cursor):
+    try:
+        micros, pk = cursor.split('-')
+        return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (AttributeError, ValueError):
+        return None
@@ -0,0 +1,177 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from PIL import Image
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from assassin_game.models import Game, MediaJob, Player
+
+VIDEO_THUMBNAIL = 't'
+WEB_VIDEO = 'v'
+IMAGE_RENDITIONS = 'i'
+
+# widths of the downscaled copies written next to every uploaded image
+RENDITIONS = (
+    ('small', 160),
+    ('medium', 640),
+    ('large', 1280),
+)
+
+
+def enqueue(instance, field, kind):
+    content_type = ContentType.objects.get_for_model(instance)
+    queued = MediaJob.objects.filter(content_type=content_type, object_id=instance.pk, field=field, kind=kind,
+                                     status='q')
+    if not queued.exists():
+        MediaJob.objects.create(content_type=content_type, object_id=instance.pk, field=field, kind=kind)
+
+
+def enqueue_post(post):
+    if not post.post_thumbnail_image:
+        enqueue(post, 'post_thumbnail_image', VIDEO_THUMBNAIL)
+    else:
+        enqueue(post, 'post_thumbnail_image', IMAGE_RENDITIONS)
+    enqueue(post, 'post_video', WEB_VIDEO)
+
+
+@receiver(post_save, sender=Player)
+@receiver(post_save, sender=Game)
+def enqueue_picture(sender, instance, update_fields=None, **kwargs):
+    field = 'profile_picture' if sender is Player else 'game_picture'
+    if update_fields is not None and field not in update_fields:
+        return
+
+    # most saves (a game starting, a player editing their year) keep the picture that was already processed
+    file = getattr(instance, field)
+    if file and not default_storage.exists(rendition_name(file.name, RENDITIONS[0][0])):
+        enqueue(instance, field, IMAGE_RENDITIONS)
+
+
+def rendition_name(name, label):
+    return 'renditions/%s_%s.jpg' % (os.path.splitext(name)[0], label)
+
+
+def rendition_urls(file):
+    if not file:
+        return {}
+    return {label: default_storage.url(rendition_name(file.name, label)) for label, _ in RENDITIONS}
+
+
+def max_attempts():
+    return getattr(settings, 'MEDIA_JOB_MAX_ATTEMPTS', 3)
+
+
+# claims the oldest queued job, or a running one whose worker was killed midway: jobs aren't touched while they
+# run, so one still running after MEDIA_JOB_TIMEOUT seconds was abandoned. the conditional update makes sure two
+# workers never run the same job
+def claim():
+    abandoned = timezone.now() - timedelta(seconds=getattr(settings, 'MEDIA_JOB_TIMEOUT', 30 * 60))
+    while True:
+        job = MediaJob.objects.filter(Q(status='q') | Q(status='r', updated__lt=abandoned)).order_by('id').first()
+        if job is None:
+            return None
+
+        current = MediaJob.objects.filter(pk=job.pk, status=job.status, updated=job.updated)
+        if job.status == 'r' and job.attempts >= max_attempts():
+            current.update(status='f', error='Worker stopped while running the job', updated=timezone.now())
+        elif current.update(status='r', attempts=F('attempts') + 1, updated=timezone.now()):
+            job.refresh_from_db()
+            return job
+
+
+def run(job):
+    if job.target is None:
+        MediaJob.objects.filter(pk=job.pk).update(status='d', error='Object was deleted')
+        return False
+
+    try:
+        with transaction.atomic():
+            PROCESSORS[job.kind](job.target, job.field)
+    except Exception as e:
+        retry = job.attempts < max_attempts()
+        MediaJob.objects.filter(pk=job.pk).update(status='q' if retry else 'f',
+                                                  error='%s: %s' % (type(e).__name__, e))
+        return False
+
+    MediaJob.objects.filter(pk=job.pk).update(status='d', error='')
+    return True
+
+
+def ffmpeg(*args):
+    binary = getattr(settings, 'FFMPEG_BINARY', 'ffmpeg')
+    if shutil.which(binary) is None:
+        raise RuntimeError('%s is not installed' % binary)
+    subprocess.check_call((binary, '-y', '-loglevel', 'error') + args)
+
+
+def video_thumbnail(post, field):
+    out = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
+    out.close()
+    try:
+        ffmpeg('-ss', '1', '-i', post.post_video.path, '-frames:v', '1', '-vf', 'scale=480:-2', out.name)
+        with open(out.name, 'rb') as f:
+            name = '%s.jpg' % os.path.splitext(os.path.basename(post.post_video.name))[0]
+            post.post_thumbnail_image.save(name, File(f), save=False)
+    finally:
+        os.remove(out.name)
+
+    post.save(update_fields=['post_thumbnail_image'])
+    image_renditions(post, field)
+
+
+# h.264/aac capped at 720p with the index up front so phones can start playing before the download finishes
+def web_video(post, field):
+    out = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
+    out.close()
+    try:
+        ffmpeg('-i', post.post_video.path, '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '28',
+               '-vf', "scale='min(720,iw)':-2", '-c:a', 'aac', '-b:a', '96k', '-movflags', '+faststart', out.name)
+        with open(out.name, 'rb') as f:
+            name = '%s.mp4' % os.path.splitext(os.path.basename(post.post_video.name))[0]
+            post.web_video.save(name, File(f), save=False)
+    finally:
+        os.remove(out.name)
+
+    post.save(update_fields=['web_video'])
+
+
+def image_renditions(instance, field):
+    file = getattr(instance, field)
+    file.open('rb')
+    try:
+        image = Image.open(file)
+        image.load()
+    finally:
+        file.close()
+
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    for label, width in RENDITIONS:
+        rendition = image.copy()
+        rendition.thumbnail((width, width * 4))
+        buf = BytesIO()
+        rendition.save(buf, 'JPEG', quality=80, optimize=True, progressive=True)
+
+        name = rendition_name(file.name, label)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        default_storage.save(name, ContentFile(buf.getvalue()))
+
+
+PROCESSORS = {
+    VIDEO_THUMBNAIL: video_thumbnail,
+    WEB_VIDEO: web_video,
+    IMAGE_RENDITIONS: image_renditions,
+}
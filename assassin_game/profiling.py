@@ -0,0 +1,124 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from django.db import connection
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger('assassin_game.profiling')
+
+# upper bounds in ms of the histogram buckets, the last bucket takes everything slower
+BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500)
+PERCENTILES = (50, 90, 99)
+
+# quoted strings and numbers, in the sql the backend logged with the parameters filled in
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?(?:e[-+]?\d+)?\b", re.IGNORECASE)
+
+lock = threading.Lock()
+samples = {}
+
+
+def enabled():
+    return getattr(settings, 'PROFILING_ENABLED', False)
+
+
+def record(view, sample):
+    with lock:
+        if view not in samples:
+            samples[view] = deque(maxlen=getattr(settings, 'PROFILING_SAMPLES', 1000))
+        samples[view].append(sample)
+
+
+def reset():
+    with lock:
+        samples.clear()
+
+
+# the sql with every literal replaced by ?, so a slow request's log doesn't carry the auth token or password hash
+# its queries filtered on
+def redact(sql):
+    return LITERAL.sub('?', sql)
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100.0))]
+
+
+def histogram(times):
+    counts = [0] * (len(BUCKETS) + 1)
+    for t in times:
+        counts[next((i for i, bound in enumerate(BUCKETS) if t <= bound), len(BUCKETS))] += 1
+    labels = ['<=%d' % bound for bound in BUCKETS] + ['>%d' % BUCKETS[-1]]
+    return dict(zip(labels, counts))
+
+
+# {view: {requests, wall/db time percentiles in ms, queries, response bytes, histogram of wall time}} for the
+# samples this process has kept
+def summary():
+    with lock:
+        snapshot = {view: list(s) for view, s in samples.items()}
+
+    result = {}
+    for view, rows in snapshot.items():
+        wall = sorted(r['wall_ms'] for r in rows)
+        db = sorted(r['db_ms'] for r in rows)
+        queries = sorted(r['queries'] for r in rows)
+        result[view] = {
+            'requests': len(rows),
+            'wall_ms': {'p%d' % p: round(percentile(wall, p), 2) for p in PERCENTILES},
+            'db_ms': {'p%d' % p: round(percentile(db, p), 2) for p in PERCENTILES},
+            'queries': {'p50': percentile(queries, 50), 'max': queries[-1]},
+            'bytes': {'p50': percentile(sorted(r['bytes'] for r in rows), 50)},
+            'histogram': histogram(wall),
+        }
+        result[view]['wall_ms']['max'] = round(wall[-1], 2)
+    return result
+
+
+# per-view wall time, query count, db time and response size for every request when PROFILING_ENABLED is set.
+# requests slower than PROFILING_SLOW_REQUEST_MS are logged as json with the sql they ran, values left out
+class ProfilingMiddleware(MiddlewareMixin):
+
+    def process_request(self, request):
+        if not enabled():
+            return
+        request._profiling = {
+            'start': time.time(),
+            'debug_cursor': connection.force_debug_cursor,
+            'queries': len(connection.queries_log),
+        }
+        # records queries without DEBUG, queries_log is bounded so this can stay on under load
+        connection.force_debug_cursor = True
+
+    def process_response(self, request, response):
+        profile = getattr(request, '_profiling', None)
+        if profile is None:
+            return response
+
+        wall_ms = (time.time() - profile['start']) * 1000
+        connection.force_debug_cursor = profile['debug_cursor']
+        queries = list(connection.queries_log)[profile['queries']:]
+
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unresolved'
+        if response.streaming:
+            size = int(response.get('Content-Length', 0))
+        else:
+            size = len(response.content)
+
+        sample = {
+            'wall_ms': wall_ms,
+            'queries': len(queries),
+            'db_ms': sum(float(q['time']) for q in queries) * 1000,
+            'bytes': size,
+        }
+        record('%s %s' % (request.method, view), sample)
+
+        if wall_ms >= getattr(settings, 'PROFILING_SLOW_REQUEST_MS', 500):
+            logger.warning(json.dumps(dict(sample, event='slow_request', view=view, method=request.method,
+                                           path=request.get_full_path(), status=response.status_code,
+                                           sql=[redact(q['sql']) for q in queries])))
+        return response
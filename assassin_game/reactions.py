@@ -0,0 +1,74 @@
+from django.db import IntegrityError, transaction
+from assassin_game import counters
+from assassin_game.models import Comment, CommentLike, Like, Post
+
+# per item results use the status codes the single like/unlike actions answer with
+APPLIED = 202
+NOT_FOUND = 404
+UNCHANGED = 409
+
+# key in an operation -> (liked model, like model, like's foreign key to it)
+KINDS = {
+    'post': (Post, Like, 'post'),
+    'comment': (Comment, CommentLike, 'comment'),
+}
+
+
+# applies a queue of {'op': 'like'|'unlike', 'post'|'comment': id} in order and returns one status per operation.
+# each kind costs a fixed number of queries however long the queue is: read what exists, insert, delete
+@transaction.atomic
+def apply_batch(user, operations):
+    results = [None] * len(operations)
+
+    for kind, (model, like_model, field) in KINDS.items():
+        ops = [(i, op) for i, op in enumerate(operations) if op.get(kind) is not None]
+        if not ops:
+            continue
+
+        ids = {op[kind] for _, op in ops}
+        # a write before anything is read, like views.update_first: it takes sqlite's write lock (and locks the
+        # likes elsewhere) so the likes read next are still there to delete and a racing request waits its turn
+        like_model.objects.filter(liker=user, **{field + '__in': ids}).update(liker=user)
+        found = set(model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        liked = set(like_model.objects.filter(liker=user, **{field + '__in': found}).values_list(field, flat=True))
+
+        # replay the queue against what is stored, a like followed by an unlike of the same object nets out
+        state = {pk: pk in liked for pk in found}
+        for i, op in ops:
+            pk = op[kind]
+            if pk not in found:
+                results[i] = NOT_FOUND
+            elif state[pk] == (op['op'] == 'like'):
+                results[i] = UNCHANGED
+            else:
+                state[pk] = not state[pk]
+                results[i] = APPLIED
+
+        to_like = [pk for pk, on in state.items() if on and pk not in liked]
+        to_unlike = [pk for pk, on in state.items() if not on and pk in liked]
+        if to_like:
+            # bulk inserts send no post_save, so the counters are bumped here
+            counters.bump(like_model, create_likes(user, like_model, field, to_like), 1)
+        if to_unlike:
+            # post_delete would otherwise cost a counter UPDATE per like
+            with counters.batched():
+                like_model.objects.filter(liker=user, **{field + '__in': to_unlike}).delete()
+
+    return results
+
+
+# returns the ids that were actually liked
+def create_likes(user, like_model, field, ids):
+    while ids:
+        try:
+            with transaction.atomic():
+                like_model.objects.bulk_create(like_model(liker=user, **{field + '_id': pk}) for pk in ids)
+                return ids
+        except IntegrityError:
+            # a single like from another request got in first, skip the rows that now exist and try again
+            existing = set(like_model.objects.filter(liker=user, **{field + '__in': ids})
+                           .values_list(field, flat=True))
+            if not existing:
+                raise
+            ids = [pk for pk in ids if pk not in existing]
+    return ids
@@ -0,0 +1,38 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+# list responses as {"columns": [...], "rows": [[...], ...]} so the keys go over the wire once instead of once per
+# object. a paginated response keeps next/previous and columnises its results, anything else is plain json
+class ColumnarJSONRenderer(JSONRenderer):
+    media_type = 'application/vnd.assassin.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and isinstance(data.get('results'), list):
+            data = dict(data, results=columns(data['results']))
+        elif isinstance(data, list):
+            data = columns(data)
+        return super(ColumnarJSONRenderer, self).render(data, accepted_media_type, renderer_context)
+
+
+def columns(rows):
+    if not rows or not all(isinstance(row, dict) for row in rows):
+        return rows
+    names = list(rows[0])
+    return {'columns': names, 'rows': [[row.get(name) for name in names] for row in rows]}
+
+
+# needs the optional msgpack package, settings only offers it when that is installed
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        import msgpack
+
+        if data is None:
+            return b''
+        # serializers already turn most values into strings, this catches the odd date or decimal
+        return msgpack.packb(data, default=str, use_bin_type=True)
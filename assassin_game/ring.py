@@ -0,0 +1,161 @@
+import random
+from django.db import transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+from assassin_game.models import Game, UserGameStatus
+from assassin_game.signals import ring_changed
+
+# each living player targets exactly one other living player and the targets form a single cycle.
+# dead players keep their old target, so lookups by target always have to filter on these statuses.
+# select_for_update here locks rows on databases that have row locks. sqlite ignores it, there the callers write
+# before they read so the whole database is already locked when these run
+LIVING = ('a', 'p')
+
+# sqlite caps a statement at 999 parameters and every row in set_targets takes three
+UPDATE_BATCH_SIZE = 300
+
+
+def insert(game, user):
+    with transaction.atomic():
+        anchor = (UserGameStatus.objects.select_for_update()
+                  .filter(game=game, status__in=LIVING).order_by('id').first())
+
+        if anchor is None:
+            s = UserGameStatus.objects.create(user=user, game=game, target=user, status='a')
+            ring_changed.send(sender=UserGameStatus, game=game, targets={user.pk: user.pk}, statuses={user.pk: 'a'})
+            return s
+
+        target_id = anchor.target_id
+        UserGameStatus.objects.filter(pk=anchor.pk).update(target=user)
+        s = UserGameStatus.objects.create(user=user, game=game, target_id=target_id, status='a')
+        ring_changed.send(sender=UserGameStatus, game=game, targets={anchor.user_id: user.pk, user.pk: target_id},
+                          statuses={user.pk: 'a'})
+        return s
+
+
+# marks user dead and hands their target to whoever was hunting them, returns (assassin_status, killed_status).
+# raises ValueError when user is already dead, a second post on them mustn't count as another kill
+def remove(game, user):
+    with transaction.atomic():
+        statuses = list(UserGameStatus.objects.select_for_update()
+                        .filter(Q(user=user) | Q(target=user, status__in=LIVING), game=game))
+        killed_status = next((s for s in statuses if s.user_id == user.pk), None)
+        if killed_status is None:
+            raise UserGameStatus.DoesNotExist('%s is not playing game %s' % (user, game.pk))
+        if killed_status.status not in LIVING:
+            raise ValueError('%s is already dead in game %s' % (user, game.pk))
+        assassin_status = next((s for s in statuses if s.user_id != user.pk), None)
+
+        if assassin_status is not None:
+            assassin_status.target_id = killed_status.target_id
+            UserGameStatus.objects.filter(pk=assassin_status.pk).update(target=killed_status.target_id)
+
+        killed_status.status = 'd'
+        UserGameStatus.objects.filter(pk=killed_status.pk).update(status='d')
+
+        targets = {assassin_status.user_id: assassin_status.target_id} if assassin_status is not None else {}
+        ring_changed.send(sender=UserGameStatus, game=game, targets=targets, statuses={killed_status.user_id: 'd'})
+        return assassin_status, killed_status
+
+
+# removes several players of one game in one pass: one locked read, one UPDATE ... CASE for the reassigned targets
+# and one UPDATE for the dead, however many are killed. returns the killed statuses
+def remove_many(game, users):
+    user_ids = list(dict.fromkeys(u.pk for u in users))
+    with transaction.atomic():
+        statuses = {s.user_id: s for s in UserGameStatus.objects.select_for_update()
+                    .filter(Q(user__in=user_ids) | Q(status__in=LIVING), game=game)}
+        missing = [pk for pk in user_ids if pk not in statuses]
+        if missing:
+            raise UserGameStatus.DoesNotExist('Users %s are not playing game %s' % (missing, game.pk))
+
+        hunters = {s.target_id: s for s in statuses.values() if s.status in LIVING}
+        reassigned = {}
+        for user_id in user_ids:
+            killed_status = statuses[user_id]
+            # same hand-off as remove, applied in memory so a chain of kills ends up with the last target
+            assassin_status = hunters.pop(user_id, None)
+            if hunters.get(killed_status.target_id) is killed_status:
+                del hunters[killed_status.target_id]
+            if assassin_status is not None and assassin_status is not killed_status:
+                assassin_status.target_id = killed_status.target_id
+                hunters[killed_status.target_id] = assassin_status
+                reassigned[assassin_status.user_id] = assassin_status
+            killed_status.status = 'd'
+
+        set_targets({s.pk: s.target_id for s in reassigned.values()})
+        UserGameStatus.objects.filter(game=game, user__in=user_ids).update(status='d')
+
+        targets = {user_id: s.target_id for user_id, s in reassigned.items() if user_id not in user_ids}
+        ring_changed.send(sender=UserGameStatus, game=game, targets=targets,
+                          statuses={user_id: 'd' for user_id in user_ids})
+        return [statuses[user_id] for user_id in user_ids]
+
+
+def shuffle(game):
+    with transaction.atomic():
+        statuses = list(UserGameStatus.objects.select_for_update()
+                        .filter(game=game, status__in=LIVING).only('id', 'user'))
+        random.shuffle(statuses)
+
+        targets = {}
+        for i, s in enumerate(statuses):
+            s.target_id = statuses[(i + 1) % len(statuses)].user_id
+            targets[s.pk] = s.target_id
+        set_targets(targets)
+        ring_changed.send(sender=UserGameStatus, game=game, targets={s.user_id: s.target_id for s in statuses},
+                          statuses={})
+        return statuses
+
+
+# moves a game from registration to progress with a freshly shuffled ring, so targets don't follow join order
+def start(game):
+    with transaction.atomic():
+        # the conditional update is the lock, it comes before any read so it works on sqlite too
+        if not Game.objects.filter(pk=game.pk, status='r').update(status='p'):
+            raise ValueError("%s isn't in registration status" % game)
+
+        game = Game.objects.get(pk=game.pk)
+        statuses = shuffle(game)
+        # saved again for the post_save receivers
+        game.save(update_fields=['status'])
+        return game, statuses
+
+
+# writes {status pk: target user id} with one UPDATE ... CASE per batch instead of one UPDATE per row
+def set_targets(targets):
+    pks = list(targets)
+    for start in range(0, len(pks), UPDATE_BATCH_SIZE):
+        batch = pks[start:start + UPDATE_BATCH_SIZE]
+        UserGameStatus.objects.filter(pk__in=batch).update(target=Case(
+            *[When(pk=pk, then=Value(targets[pk])) for pk in batch],
+            output_field=IntegerField()
+        ))
+
+
+# returns a list of problems, empty when the living players form exactly one cycle
+def check_integrity(game):
+    targets = dict(UserGameStatus.objects.filter(game=game, status__in=LIVING).values_list('user_id', 'target_id'))
+    errors = []
+
+    for user_id, target_id in targets.items():
+        if target_id not in targets:
+            errors.append('User %s targets %s who is not alive' % (user_id, target_id))
+
+    hunted = {}
+    for user_id, target_id in targets.items():
+        hunted.setdefault(target_id, []).append(user_id)
+    for target_id, hunters in hunted.items():
+        if len(hunters) > 1:
+            errors.append('User %s is targeted by %s' % (target_id, sorted(hunters)))
+
+    if targets and not errors:
+        start = next(iter(targets))
+        seen = {start}
+        current = targets[start]
+        while current != start:
+            seen.add(current)
+            current = targets[current]
+        if len(seen) != len(targets):
+            errors.append('Ring only covers %d of %d living players' % (len(seen), len(targets)))
+
+    return errors
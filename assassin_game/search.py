@@ -0,0 +1,161 @@
+import re
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q
+from assassin_game.models import Comment, Post
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+# (fts table, content table, indexed columns, prefix lengths). external content tables store only the index and
+# triggers keep it in step with every insert, update and delete, whoever makes them
+INDEXES = {
+    User: ('assassin_game_user_fts', 'auth_user', ('username', 'first_name', 'last_name'), '1 2 3'),
+    Post: ('assassin_game_post_fts', 'assassin_game_post', ('caption',), '2 3'),
+    Comment: ('assassin_game_comment_fts', 'assassin_game_comment', ('text',), '2 3'),
+}
+
+
+def limit():
+    return getattr(settings, 'SEARCH_LIMIT', 20)
+
+
+def fts5_available(conn):
+    if conn.vendor != 'sqlite':
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+checked = {}
+
+
+# sqlite rebuilds a table to alter it, which drops its triggers. a later migration touching an indexed table has
+# to be followed by manage.py rebuild_search_index, until then searches fall back to LIKE. checked once per process
+def installed(conn=connection):
+    if conn.alias not in checked:
+        checked[conn.alias] = fts5_available(conn) and count_triggers(conn) == 3 * len(INDEXES)
+    return checked[conn.alias]
+
+
+def count_triggers(conn):
+    names = ['%s_%s' % (index[0], suffix) for index in INDEXES.values() for suffix in ('ai', 'ad', 'au')]
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (%s)"
+                       % ', '.join(['%s'] * len(names)), names)
+        return cursor.fetchone()[0]
+
+
+def uninstall(conn=connection):
+    checked.pop(conn.alias, None)
+    with conn.cursor() as cursor:
+        for fts, table, columns, prefix in INDEXES.values():
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute('DROP TRIGGER IF EXISTS %s_%s' % (fts, suffix))
+            cursor.execute('DROP TABLE IF EXISTS %s' % fts)
+
+
+# (re)creates the index tables and triggers and fills them from the content tables. returns False when this
+# database has no FTS5
+def install(conn=connection):
+    if not fts5_available(conn):
+        return False
+
+    uninstall(conn)
+    with conn.cursor() as cursor:
+        for fts, table, columns, prefix in INDEXES.values():
+            names = ', '.join(columns)
+            new = ', '.join('new.%s' % c for c in columns)
+            old = ', '.join('old.%s' % c for c in columns)
+            cursor.execute(
+                "CREATE VIRTUAL TABLE %s USING fts5(%s, content='%s', content_rowid='id', prefix='%s', "
+                "tokenize='unicode61 remove_diacritics 1')" % (fts, names, table, prefix))
+            cursor.execute(
+                "CREATE TRIGGER %s_ai AFTER INSERT ON %s BEGIN "
+                "INSERT INTO %s(rowid, %s) VALUES (new.id, %s); END" % (fts, table, fts, names, new))
+            cursor.execute(
+                "CREATE TRIGGER %s_ad AFTER DELETE ON %s BEGIN "
+                "INSERT INTO %s(%s, rowid, %s) VALUES ('delete', old.id, %s); END"
+                % (fts, table, fts, fts, names, old))
+            cursor.execute(
+                "CREATE TRIGGER %s_au AFTER UPDATE OF %s ON %s BEGIN "
+                "INSERT INTO %s(%s, rowid, %s) VALUES ('delete', old.id, %s); "
+                "INSERT INTO %s(rowid, %s) VALUES (new.id, %s); END"
+                % (fts, names, table, fts, fts, names, old, fts, names, new))
+            cursor.execute("INSERT INTO %s(%s) VALUES ('rebuild')" % (fts, fts))
+    checked.pop(conn.alias, None)
+    return True
+
+
+# every word of the query has to match, the last one (or all of them with prefix_all) as a prefix so results show
+# up while the user is still typing
+def match_expression(words, prefix_all):
+    terms = ['"%s"' % w for w in words]
+    if prefix_all:
+        terms = [t + '*' for t in terms]
+    else:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def fts_ids(model, words, prefix_all, where='', params=()):
+    fts, table = INDEXES[model][:2]
+    sql = ('SELECT c.id FROM %s f JOIN %s c ON c.id = f.rowid WHERE %s MATCH %%s %s ORDER BY f.rank LIMIT %%s'
+           % (fts, table, fts, where))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match_expression(words, prefix_all)] + list(params) + [limit()])
+        return [row[0] for row in cursor.fetchall()]
+
+
+# objects in the order of the ids, which is the ranking
+def in_order(queryset, ids):
+    objects = queryset.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
+
+
+def users(query):
+    words = WORD.findall(query)
+    queryset = User.objects.select_related('player')
+    if not words:
+        return []
+    if installed():
+        return in_order(queryset, fts_ids(User, words, True))
+
+    for word in words:
+        queryset = queryset.filter(Q(username__istartswith=word) | Q(first_name__istartswith=word) |
+                                   Q(last_name__istartswith=word))
+    return list(queryset.order_by('username')[:limit()])
+
+
+def posts(query, game=None):
+    words = WORD.findall(query)
+    queryset = Post.objects.select_related('poster', 'killed', 'game')
+    if not words:
+        return []
+    if installed():
+        where, params = ('AND c.game_id = %s', [game]) if game is not None else ('', [])
+        return in_order(queryset, fts_ids(Post, words, False, where, params))
+
+    if game is not None:
+        queryset = queryset.filter(game=game)
+    for word in words:
+        queryset = queryset.filter(caption__icontains=word)
+    return list(queryset.order_by('-time_confirmed', '-id')[:limit()])
+
+
+def comments(query, game=None):
+    words = WORD.findall(query)
+    queryset = Comment.objects.select_related('commenter')
+    if not words:
+        return []
+    if installed():
+        where, params = ('AND c.post_id IN (SELECT id FROM assassin_game_post WHERE game_id = %s)', [game]) \
+            if game is not None else ('', [])
+        return in_order(queryset, fts_ids(Comment, words, False, where, params))
+
+    if game is not None:
+        queryset = queryset.filter(post__game=game)
+    for word in words:
+        queryset = queryset.filter(text__icontains=word)
+    return list(queryset.order_by('-time', '-id')[:limit()])
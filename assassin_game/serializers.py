@@ -1,34 +1,117 @@
-from assassin_game.models import Player, Game, Post, Like, Comment, CommentLike, UserGameStatus, Badge, Report
+from assassin_game.models import (Player, Game, Post, Like, Comment, CommentLike, UserGameStatus, Badge, Report,
+                                  LeaderboardEntry, Upload)
+from assassin_game import processing
 from rest_framework import serializers
 from django.contrib.auth.models import User
 
 
-class GameSerializer(serializers.ModelSerializer):
+# ?fields=id,status trims a GET response down to the named fields and ?expand=poster swaps a primary key for the
+# object it points at, for the fields listed in expandable_fields. only the top level serializer of a response
+# looks at them, nested ones always render in full
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super(DynamicFieldsModelSerializer, self).__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD') or not hasattr(request, 'query_params'):
+            return
+
+        for name in request.query_params.get('expand', '').split(','):
+            if name in self.expandable_fields and name in self.fields:
+                self.fields[name] = self.expandable_fields[name](read_only=True)
+
+        requested = set(request.query_params.get('fields', '').split(',')) - {''}
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+
+# urls of the downscaled copies made by the media worker, they appear shortly after the original is uploaded
+class RenditionsField(serializers.ReadOnlyField):
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = processing.rendition_urls(value)
+        if request is not None:
+            urls = {label: request.build_absolute_uri(url) for label, url in urls.items()}
+        return urls
+
+
+class GameSerializer(DynamicFieldsModelSerializer):
+    game_picture_renditions = RenditionsField(source='game_picture')
+
     class Meta:
         model = Game
-        fields = ('id', 'status', 'name', 'game_picture',)
+        fields = ('id', 'status', 'name', 'game_picture', 'game_picture_renditions',)
 
 
-class PlayerSerializer(serializers.ModelSerializer):
+class PlayerSerializer(DynamicFieldsModelSerializer):
+    profile_picture_renditions = RenditionsField(source='profile_picture')
+
     class Meta:
         model = Player
-        fields = ('year', 'profile_picture')
+        fields = ('year', 'profile_picture', 'profile_picture_renditions')
+
+
+# what other players get to see of a user when it is expanded into a post, status or comment
+class PublicUserSerializer(DynamicFieldsModelSerializer):
 
+    class Meta:
+        model = User
+        fields = ('id', 'username', 'first_name', 'last_name')
 
-class PostSerializer(serializers.ModelSerializer):
+
+class PostSerializer(DynamicFieldsModelSerializer):
+    expandable_fields = {'poster': PublicUserSerializer, 'killed': PublicUserSerializer, 'game': GameSerializer}
     poster = serializers.PrimaryKeyRelatedField(many=False, read_only=True)
     killed = serializers.PrimaryKeyRelatedField(many=False, read_only=True)
     game = serializers.PrimaryKeyRelatedField(many=False, read_only=False, queryset=Game.objects.all())
     status = serializers.CharField(read_only=True)
     time_confirmed = serializers.DateTimeField(read_only=True)
+    post_video = serializers.FileField(required=False)
+    web_video = serializers.FileField(read_only=True)
+    post_thumbnail_image_renditions = RenditionsField(source='post_thumbnail_image')
+    like_count = serializers.IntegerField(read_only=True)
+    comment_count = serializers.IntegerField(read_only=True)
+    report_count = serializers.IntegerField(read_only=True)
+    # a finished chunked upload can stand in for the multipart post_video
+    upload = serializers.PrimaryKeyRelatedField(many=False, write_only=True, required=False,
+                                                queryset=Upload.objects.filter(status='c'))
+
+    def validate(self, data):
+        if self.instance is None and not data.get('post_video') and not data.get('upload'):
+            raise serializers.ValidationError('Either post_video or upload is required')
+        return data
 
     class Meta:
         model = Post
-        fields = ('id', 'post_video', 'post_thumbnail_image', 'caption', 'status', 'time_confirmed', 'poster', 'killed',
-                  'game', 'longitude', 'latitude')
+        fields = ('id', 'post_video', 'web_video', 'post_thumbnail_image', 'post_thumbnail_image_renditions', 'caption',
+                  'status', 'time_confirmed', 'poster', 'killed', 'game', 'longitude', 'latitude', 'like_count',
+                  'comment_count', 'report_count', 'upload')
+
+
+class FeedPostSerializer(PostSerializer):
+    poster_username = serializers.CharField(read_only=True)
+    killed_username = serializers.CharField(read_only=True)
+    liked_by_me = serializers.BooleanField(read_only=True)
+
+    class Meta(PostSerializer.Meta):
+        fields = PostSerializer.Meta.fields + ('poster_username', 'killed_username', 'liked_by_me')
 
 
-class UserGameStatusSerializer(serializers.ModelSerializer):
+class UploadSerializer(DynamicFieldsModelSerializer):
+    offset = serializers.IntegerField(read_only=True)
+    status = serializers.CharField(read_only=True)
+    file = serializers.FileField(read_only=True)
+
+    class Meta:
+        model = Upload
+        fields = ('id', 'filename', 'size', 'offset', 'status', 'file')
+
+
+class UserGameStatusSerializer(DynamicFieldsModelSerializer):
+    expandable_fields = {'user': PublicUserSerializer, 'target': PublicUserSerializer, 'game': GameSerializer}
     user = serializers.PrimaryKeyRelatedField(many=False, read_only=True)
     target = serializers.PrimaryKeyRelatedField(many=False, read_only=True)
     game = serializers.PrimaryKeyRelatedField(many=False, read_only=True)
@@ -38,7 +121,7 @@ class UserGameStatusSerializer(serializers.ModelSerializer):
         fields = ('id', 'status', 'game', 'user', 'target')
 
 
-class LikeSerializer(serializers.ModelSerializer):
+class LikeSerializer(DynamicFieldsModelSerializer):
     post = serializers.PrimaryKeyRelatedField(many=False, read_only=False, queryset=Post.objects.all())
     liker = serializers.PrimaryKeyRelatedField(many=False, read_only=True)
 
@@ -47,7 +130,19 @@ class LikeSerializer(serializers.ModelSerializer):
         fields = ('id', 'post', 'liker')
 
 
-class BadgeSerializer(serializers.ModelSerializer):
+# one queued reaction for /api/likes/batch/, naming either a post or a comment
+class ReactionSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=('like', 'unlike'))
+    post = serializers.IntegerField(required=False)
+    comment = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        if ('post' in data) == ('comment' in data):
+            raise serializers.ValidationError('Give exactly one of post or comment')
+        return data
+
+
+class BadgeSerializer(DynamicFieldsModelSerializer):
     game = serializers.PrimaryKeyRelatedField(many=False, read_only=False, queryset=Game.objects.all())
     user = serializers.PrimaryKeyRelatedField(many=False, read_only=True)
 
@@ -56,16 +151,26 @@ class BadgeSerializer(serializers.ModelSerializer):
         fields = ('id', 'game', 'user', 'type')
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(DynamicFieldsModelSerializer):
+    expandable_fields = {'commenter': PublicUserSerializer}
     post = serializers.PrimaryKeyRelatedField(many=False, read_only=False, queryset=Post.objects.all())
     commenter = serializers.PrimaryKeyRelatedField(many=False, read_only=True)
+    like_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Comment
-        fields = ('id', 'post', 'commenter', 'text', 'time')
+        fields = ('id', 'post', 'commenter', 'text', 'time', 'like_count')
+
 
+class CommentStreamSerializer(CommentSerializer):
+    commenter_username = serializers.CharField(read_only=True)
+    liked_by_me = serializers.BooleanField(read_only=True)
 
-class CommentLikeSerializer(serializers.ModelSerializer):
+    class Meta(CommentSerializer.Meta):
+        fields = CommentSerializer.Meta.fields + ('commenter_username', 'liked_by_me')
+
+
+class CommentLikeSerializer(DynamicFieldsModelSerializer):
     comment = serializers.PrimaryKeyRelatedField(many=False, read_only=False, queryset=Comment.objects.all())
     liker = serializers.PrimaryKeyRelatedField(many=False, read_only=True)
 
@@ -74,7 +179,7 @@ class CommentLikeSerializer(serializers.ModelSerializer):
         fields = ('id', 'comment', 'liker')
 
 
-class ReportSerializer(serializers.ModelSerializer):
+class ReportSerializer(DynamicFieldsModelSerializer):
     post = serializers.PrimaryKeyRelatedField(many=False, read_only=False, queryset=Post.objects.all())
     reporter = serializers.PrimaryKeyRelatedField(many=False, read_only=True)
 
@@ -83,7 +188,17 @@ class ReportSerializer(serializers.ModelSerializer):
         fields = ('id', 'post', 'reporter')
 
 
-class UserSerializer(serializers.ModelSerializer):
+class LeaderboardEntrySerializer(DynamicFieldsModelSerializer):
+    game = serializers.PrimaryKeyRelatedField(many=False, read_only=True)
+    user = serializers.PrimaryKeyRelatedField(many=False, read_only=True)
+    username = serializers.CharField(source='user.username', read_only=True)
+
+    class Meta:
+        model = LeaderboardEntry
+        fields = ('id', 'game', 'user', 'username', 'rank', 'kills', 'last_kill_time', 'alive')
+
+
+class UserSerializer(DynamicFieldsModelSerializer):
     player = PlayerSerializer(required=True)
     password = serializers.CharField(write_only=True)
 
@@ -0,0 +1,8 @@
+from django.dispatch import Signal
+
+# sent inside the verifying transaction once the post is saved as 'v'
+post_verified = Signal(providing_args=['post'])
+
+# sent by the kill ring whenever targets or statuses change, both as {user id: new value}. the ring writes with
+# queryset updates, so this is the only notice listeners get
+ring_changed = Signal(providing_args=['game', 'targets', 'statuses'])
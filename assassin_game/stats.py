@@ -0,0 +1,38 @@
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from assassin_game import moderation
+from assassin_game.models import LeaderboardEntry, Post, Report, UserGameStatus
+
+TOP_KILLERS = 10
+
+
+# {'alive': 12, 'dead': 3, ...} with the choice names as keys
+def count_by_status(queryset, choices):
+    names = dict(choices)
+    rows = queryset.order_by().values_list('status').annotate(count=Count('id'))
+    return {names.get(status, status).lower(): count for status, count in rows}
+
+
+# everything an organizer's dashboard shows about a game, in six grouped queries however big the game is
+def snapshot(game):
+    players = count_by_status(UserGameStatus.objects.filter(game=game), UserGameStatus.USER_STATUS_CHOICE)
+    posts = count_by_status(Post.objects.filter(game=game), Post.POST_STATUS_CHOICE)
+
+    kills_per_day = (Post.objects.filter(game=game, status='v').annotate(day=TruncDate('time_confirmed'))
+                     .order_by('day').values('day').annotate(kills=Count('id')))
+    top_killers = (LeaderboardEntry.objects.filter(game=game, kills__gt=0).order_by('rank', 'id')
+                   .values('user', 'user__username', 'kills', 'rank', 'alive')[:TOP_KILLERS])
+    reports = Report.objects.filter(post__game=game).aggregate(reports=Count('id'),
+                                                               reported_posts=Count('post', distinct=True))
+    flagged = Post.objects.filter(game=game, report_count__gte=moderation.report_threshold()).exclude(status='d')
+
+    return {
+        'game': game.pk,
+        'players': players,
+        'posts': posts,
+        'awaiting_verification': posts.get('pending', 0) + posts.get('conflicting', 0),
+        'kills_per_day': [{'day': row['day'], 'kills': row['kills']} for row in kills_per_day],
+        'top_killers': [{'user': row['user'], 'username': row['user__username'], 'kills': row['kills'],
+                         'rank': row['rank'], 'alive': row['alive']} for row in top_killers],
+        'reports': dict(reports, flagged_posts=flagged.count()),
+    }
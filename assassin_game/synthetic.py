@@ -0,0 +1,41 @@
+import random
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.utils import timezone
+from assassin_game import counters, leaderboard
+from assassin_game.models import Game, Player, Post, Comment, Like, UserGameStatus
+
+
+# builds a game in progress with one ring over all players, using bulk inserts so 10k+ players seed in seconds
+def seed_game(players, posts=0, comments=0, prefix='synthetic', likes=0):
+    game = Game.objects.create(status='p', name='%s game' % prefix, game_picture='game_pictures/synthetic.jpg')
+
+    username = '%s-%d-' % (prefix, game.id)
+    User.objects.bulk_create(User(username='%s%d' % (username, i)) for i in range(players))
+    users = list(User.objects.filter(username__startswith=username).order_by('id'))
+
+    Player.objects.bulk_create(Player(user=user, year='2017', profile_picture='profile_pictures/synthetic.jpg')
+                               for user in users)
+    UserGameStatus.objects.bulk_create(UserGameStatus(user=user, game=game, target=users[(i + 1) % len(users)],
+                                                      status='a') for i, user in enumerate(users))
+
+    now = timezone.now()
+    Post.objects.bulk_create(_synthetic_post(game, users, now) for _ in range(posts))
+    post_ids = list(Post.objects.filter(game=game).values_list('id', flat=True))
+    if post_ids:
+        Comment.objects.bulk_create(Comment(post_id=random.choice(post_ids), commenter=random.choice(users),
+                                            text='synthetic comment') for _ in range(comments))
+        pairs = {(random.choice(post_ids), random.randrange(len(users))) for _ in range(likes)}
+        Like.objects.bulk_create(Like(post_id=post_id, liker=users[i]) for post_id, i in pairs)
+
+    # bulk inserts skip the signals that keep these up to date
+    counters.reconcile()
+    leaderboard.rebuild(game)
+    return game, users
+
+
+def _synthetic_post(game, users, now):
+    i = random.randrange(len(users))
+    return Post(poster=users[i], killed=users[(i + 1) % len(users)], game=game,
+                post_video='post_videos/synthetic.mp4', post_thumbnail_image='post_thumbnail_image/synthetic.jpg',
+                status=random.choice('vvvvpcd'), time_confirmed=now - timedelta(minutes=random.randrange(10000)))
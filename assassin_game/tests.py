@@ -1,3 +1,998 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+from PIL import Image
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
+from assassin_game import (authentication, badges, benchmark, cache, counters, events, killmap, leaderboard,
+                           processing, profiling, reactions, ring, search, uploads)
+from assassin_game.models import (Game, Player, Post, Like, Comment, CommentLike, UserGameStatus, Badge,
+                                  Report, LeaderboardEntry, Upload, MediaJob)
 
-# Create your tests here.
+
+# every list endpoint should cost the same number of queries no matter how many rows it serializes
+class ListQueryCountTest(APITestCase):
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.game = Game.objects.create(status='p', name='Test Game', game_picture='game_pictures/test.jpg')
+        self.seeded = 0
+
+    def seed(self, count):
+        for i in range(self.seeded, self.seeded + count):
+            user = User.objects.create(username='player%d' % i)
+            Player.objects.create(user=user, year='2017', profile_picture='profile_pictures/%d.jpg' % i)
+            UserGameStatus.objects.create(user=user, game=self.game, target=user, status='a')
+            post = Post.objects.create(poster=user, killed=user, game=self.game, post_video='post_videos/%d.mp4' % i,
+                                       post_thumbnail_image='post_thumbnail_image/%d.jpg' % i, status='v',
+                                       time_confirmed=timezone.now())
+            Like.objects.create(post=post, liker=user)
+            comment = Comment.objects.create(post=post, commenter=user, text='nice')
+            CommentLike.objects.create(comment=comment, liker=user)
+            Badge.objects.create(user=user, game=self.game, type='f')
+            Report.objects.create(post=post, reporter=user)
+            LeaderboardEntry.objects.create(game=self.game, user=user)
+        self.seeded += count
+
+    def assertFixedQueries(self, url, num):
+        self.seed(2)
+        with self.assertNumQueries(num):
+            self.client.get(url)
+        self.seed(8)
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_games(self):
+        for i in range(9):
+            Game.objects.create(status='r', name='Game %d' % i, game_picture='game_pictures/test.jpg')
+        with self.assertNumQueries(1):
+            self.client.get('/api/games/')
+
+    def test_users(self):
+        self.assertFixedQueries('/api/users/', 1)
+
+    def test_posts(self):
+        self.assertFixedQueries('/api/posts/', 1)
+
+    def test_feed(self):
+        self.assertFixedQueries('/api/posts/feed/', 1)
+
+    def test_statuses(self):
+        self.assertFixedQueries('/api/statuses/', 1)
+
+    def test_likes(self):
+        self.assertFixedQueries('/api/likes/', 1)
+
+    def test_comments(self):
+        self.assertFixedQueries('/api/comments/', 1)
+
+    def test_comment_likes(self):
+        self.assertFixedQueries('/api/comment-likes/', 1)
+
+    def test_badges(self):
+        self.assertFixedQueries('/api/badges/', 1)
+
+    def test_reports(self):
+        self.assertFixedQueries('/api/reports/', 1)
+
+    def test_leaderboard(self):
+        self.assertFixedQueries('/api/leaderboard/', 1)
+
+    def test_feed_pages_through_ties(self):
+        user = User.objects.create(username='poster')
+        now = timezone.now()
+        posts = [Post.objects.create(poster=user, killed=user, game=self.game, post_video='post_videos/test.mp4',
+                                     status='v', time_confirmed=now if i < 5 else now - timedelta(minutes=i))
+                 for i in range(9)]
+
+        seen, url = [], '/api/posts/feed/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen.append([p['id'] for p in response.data['results']])
+            url = response.data['next']
+            if len(seen) == 1:
+                # lands in the tie above the first page, an offset into the tie would now repeat a post
+                Post.objects.create(poster=user, killed=user, game=self.game, post_video='post_videos/test.mp4',
+                                    status='v', time_confirmed=now)
+        self.assertEqual(sum(seen, []), [p.id for p in reversed(posts[:5])] + [p.id for p in posts[5:]])
+
+        # and back from the last page, now with the new post at the top
+        back, url = [], response.data['previous']
+        while url:
+            response = self.client.get(url)
+            back = [p['id'] for p in response.data['results']] + back
+            url = response.data['previous']
+        newest = Post.objects.latest('id').id
+        self.assertEqual(back + seen[-1], [newest] + sum(seen, []))
+
+    def test_page_size(self):
+        self.seed(30)
+        for page_size, expected in (('10', 10), ('1000', 30), ('0', 25), ('-5', 25), ('abc', 25)):
+            response = self.client.get('/api/users/?page_size=%s' % page_size)
+            self.assertEqual(len(response.data['results']), expected)
+
+        self.seed(80)
+        self.assertEqual(len(self.client.get('/api/users/?page_size=1000').data['results']), 100)
+
+
+class RingTest(APITestCase):
+
+    def setUp(self):
+        self.game = Game.objects.create(status='r', name='Test Game', game_picture='game_pictures/test.jpg')
+        self.users = [User.objects.create(username='player%d' % i) for i in range(5)]
+        for user in self.users:
+            ring.insert(self.game, user)
+
+    def test_insert_keeps_one_cycle(self):
+        self.assertEqual(ring.check_integrity(self.game), [])
+
+    def test_remove_hands_target_to_assassin(self):
+        killed = self.users[2]
+        killed_target = UserGameStatus.objects.get(user=killed, game=self.game).target_id
+        with self.assertNumQueries(5):
+            assassin_status, killed_status = ring.remove(self.game, killed)
+
+        self.assertEqual(assassin_status.target_id, killed_target)
+        self.assertEqual(UserGameStatus.objects.get(pk=assassin_status.pk).target_id, killed_target)
+        self.assertEqual(UserGameStatus.objects.get(pk=killed_status.pk).status, 'd')
+        self.assertEqual(ring.check_integrity(self.game), [])
+
+    def test_remove_many_hands_targets_down_the_chain(self):
+        ring.shuffle(self.game)
+        targets = dict(UserGameStatus.objects.filter(game=self.game).values_list('user_id', 'target_id'))
+        first = self.users[0].pk
+        second, third = targets[first], targets[targets[first]]
+
+        with self.assertNumQueries(5):
+            ring.remove_many(self.game, [User(pk=second), User(pk=third)])
+        self.assertEqual(UserGameStatus.objects.get(user=first, game=self.game).target_id, targets[third])
+        self.assertEqual(ring.check_integrity(self.game), [])
+
+    def test_shuffle_keeps_one_cycle(self):
+        ring.remove(self.game, self.users[0])
+        ring.shuffle(self.game)
+        self.assertEqual(ring.check_integrity(self.game), [])
+
+    def test_check_integrity_finds_broken_ring(self):
+        UserGameStatus.objects.filter(user=self.users[0], game=self.game).update(target=self.users[0])
+        self.assertNotEqual(ring.check_integrity(self.game), [])
+
+    def test_start_shuffles_and_starts_game(self):
+        game, statuses = ring.start(self.game)
+        self.assertEqual(Game.objects.get(pk=self.game.pk).status, 'p')
+        self.assertEqual(len(statuses), 5)
+        self.assertEqual(ring.check_integrity(self.game), [])
+        self.assertRaises(ValueError, ring.start, self.game)
+
+
+class PostActionTest(APITestCase):
+
+    def setUp(self):
+        self.game = Game.objects.create(status='r', name='Test Game', game_picture='game_pictures/test.jpg')
+        self.users = [User.objects.create(username='player%d' % i) for i in range(3)]
+        for user in self.users:
+            ring.insert(self.game, user)
+        ring.start(self.game)
+
+        self.killer = self.users[0]
+        self.killed = UserGameStatus.objects.get(user=self.killer, game=self.game).target
+        UserGameStatus.objects.filter(user=self.killed, game=self.game).update(status='p')
+        self.post = Post.objects.create(poster=self.killer, killed=self.killed, game=self.game,
+                                        post_video='post_videos/test.mp4',
+                                        post_thumbnail_image='post_thumbnail_image/test.jpg', status='p',
+                                        time_confirmed=timezone.now())
+
+    def test_verify_twice_conflicts(self):
+        self.client.force_authenticate(self.killed)
+        self.assertEqual(self.client.post('/api/posts/%d/verify/' % self.post.id).status_code, 202)
+        self.assertEqual(self.client.post('/api/posts/%d/verify/' % self.post.id).status_code, 409)
+        self.assertEqual(ring.check_integrity(self.game), [])
+
+    def test_dead_player_is_not_killed_twice(self):
+        self.client.force_authenticate(self.killed)
+        self.assertEqual(self.client.post('/api/posts/%d/deny/' % self.post.id).status_code, 202)
+        second = Post.objects.create(poster=self.killer, killed=self.killed, game=self.game,
+                                     post_video='post_videos/test.mp4', status='p', time_confirmed=timezone.now())
+        self.assertEqual(self.client.post('/api/posts/%d/verify/' % second.id).status_code, 202)
+        # the first post is still conflicting, neither the killed player nor an admin can count it now
+        self.assertEqual(self.client.post('/api/posts/%d/verify/' % self.post.id).status_code, 409)
+        self.client.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        self.assertEqual(self.client.post('/api/posts/%d/admin_verify/' % self.post.id).status_code, 409)
+
+        self.assertEqual(Post.objects.get(pk=self.post.pk).status, 'c')
+        self.assertEqual(LeaderboardEntry.objects.get(user=self.killer, game=self.game).kills, 1)
+        self.assertEqual(ring.check_integrity(self.game), [])
+
+    def test_verify_replays_idempotency_key(self):
+        self.client.force_authenticate(self.killed)
+        url = '/api/posts/%d/verify/' % self.post.id
+        first = self.client.post(url, HTTP_IDEMPOTENCY_KEY='retry-1')
+        second = self.client.post(url, HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEqual(second.status_code, first.status_code)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+
+    def test_idempotency_key_reused_for_other_request(self):
+        self.client.force_authenticate(self.killed)
+        self.client.post('/api/posts/%d/like/' % self.post.id, HTTP_IDEMPOTENCY_KEY='retry-1')
+        response = self.client.post('/api/posts/%d/report/' % self.post.id, HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEqual(response.status_code, 422)
+
+    def test_purging_idempotency_keys_is_a_fast_delete(self):
+        self.client.force_authenticate(self.killer)
+        for i in range(3):
+            self.client.post('/api/posts/%d/report/' % self.post.id, HTTP_IDEMPOTENCY_KEY='retry-%d' % i)
+        with self.assertNumQueries(1):
+            call_command('purge_idempotency_keys', hours=-1, stdout=StringIO())
+
+    def test_like_twice_conflicts(self):
+        self.client.force_authenticate(self.killer)
+        self.assertEqual(self.client.post('/api/posts/%d/like/' % self.post.id).status_code, 202)
+        self.assertEqual(self.client.post('/api/posts/%d/like/' % self.post.id).status_code, 409)
+        self.assertEqual(Like.objects.filter(post=self.post).count(), 1)
+
+    def test_batch_reactions(self):
+        comment = Comment.objects.create(post=self.post, commenter=self.killed, text='nope')
+        CommentLike.objects.create(comment=comment, liker=self.killer)
+        self.client.force_authenticate(self.killer)
+
+        operations = [
+            {'op': 'like', 'post': self.post.id},
+            {'op': 'like', 'post': self.post.id},
+            {'op': 'unlike', 'comment': comment.id},
+            {'op': 'unlike', 'comment': comment.id},
+            {'op': 'like', 'post': self.post.id + 100},
+        ]
+        response = self.client.post('/api/likes/batch/', {'operations': operations}, format='json')
+        self.assertEqual([r['status'] for r in response.data['results']], [202, 409, 202, 409, 404])
+        self.assertTrue(Like.objects.filter(post=self.post, liker=self.killer).exists())
+        self.assertFalse(CommentLike.objects.filter(comment=comment).exists())
+
+        bad = self.client.post('/api/likes/batch/', {'operations': [{'op': 'like'}]}, format='json')
+        self.assertEqual(bad.status_code, 400)
+
+        self.post.refresh_from_db()
+        comment.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count, comment.like_count), (1, 1, 0))
+
+    def test_batch_unlikes_cost_fixed_queries(self):
+        posts = [Post.objects.create(poster=self.killer, killed=self.killed, game=self.game, status='v',
+                                     post_video='post_videos/test.mp4', time_confirmed=timezone.now())
+                 for _ in range(25)]
+        reactions.apply_batch(self.killer, [{'op': 'like', 'post': p.id} for p in posts])
+
+        with CaptureQueriesContext(connection) as small:
+            reactions.apply_batch(self.killer, [{'op': 'unlike', 'post': p.id} for p in posts[:5]])
+        with self.assertNumQueries(len(small)):
+            reactions.apply_batch(self.killer, [{'op': 'unlike', 'post': p.id} for p in posts[5:]])
+
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(Post.objects.filter(like_count=0).count(), 26)
+
+    def test_moderation_queue_and_bulk_verify(self):
+        staff = User.objects.create(username='admin', is_staff=True)
+        self.client.force_authenticate(staff)
+        Post.objects.filter(pk=self.post.pk).update(status='c')
+        reported = Post.objects.create(poster=self.killed, killed=self.killer, game=self.game,
+                                       post_video='post_videos/test.mp4', status='v', report_count=5,
+                                       time_confirmed=timezone.now())
+
+        queue = self.client.get('/api/posts/moderation/')
+        self.assertEqual([p['id'] for p in queue.data['results']], [self.post.id, reported.id])
+
+        response = self.client.post('/api/posts/moderate/', {'verify': [self.post.id, reported.id]}, format='json')
+        self.assertEqual((response.data['verified'], response.data['skipped']), ([self.post.id], [reported.id]))
+        self.assertEqual(UserGameStatus.objects.get(user=self.killed, game=self.game).status, 'd')
+        self.assertEqual(LeaderboardEntry.objects.get(user=self.killer, game=self.game).kills, 1)
+        self.assertEqual(ring.check_integrity(self.game), [])
+
+    def test_bulk_verify_skips_dead_players(self):
+        staff = User.objects.create(username='admin', is_staff=True)
+        self.client.force_authenticate(staff)
+        Post.objects.filter(pk=self.post.pk).update(status='c')
+        # a second conflicting post on the same player, and one on a player killed by another post since
+        again = Post.objects.create(poster=self.killer, killed=self.killed, game=self.game, status='c',
+                                    post_video='post_videos/test.mp4', time_confirmed=timezone.now())
+        other = UserGameStatus.objects.get(user=self.killed, game=self.game).target
+        ring.remove(self.game, other)
+        late = Post.objects.create(poster=self.killed, killed=other, game=self.game, status='c',
+                                   post_video='post_videos/test.mp4', time_confirmed=timezone.now())
+
+        response = self.client.post('/api/posts/moderate/', {'verify': [self.post.id, again.id, late.id]},
+                                    format='json')
+        self.assertEqual((response.data['verified'], response.data['skipped']), ([self.post.id], [again.id, late.id]))
+        self.assertEqual(LeaderboardEntry.objects.get(user=self.killer, game=self.game).kills, 1)
+        self.assertEqual(ring.check_integrity(self.game), [])
+
+        self.assertEqual(Post.objects.get(pk=again.pk).status, 'c')
+
+        response = self.client.post('/api/posts/moderate/', {'verify': str(again.id)}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/posts/moderate/', [again.id], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_kill_map(self):
+        self.client.force_authenticate(self.killed)
+        self.client.post('/api/posts/%d/verify/' % self.post.id)
+        url = '/api/games/%d/map/?bbox=-118.5,34.1,-118.3,34.2&zoom=%d'
+
+        cells = self.client.get(url % (self.game.id, 12)).data
+        self.assertEqual((cells['type'], cells['zoom'], len(cells['cells'])), ('cells', 13, 1))
+        self.assertAlmostEqual(cells['cells'][0]['latitude'], self.post.latitude)
+
+        kills = self.client.get(url % (self.game.id, 18)).data
+        self.assertEqual([k['id'] for k in kills['kills']], [self.post.id])
+
+        killmap.rebuild(self.game)
+        self.assertEqual(self.client.get(url % (self.game.id, 12)).data['cells'], cells['cells'])
+        self.assertEqual(self.client.get('/api/games/%d/map/' % self.game.id).status_code, 400)
+        for bbox in ('nan,34.1,-118.3,34.2', '-118.5,34.1,inf,34.2', '-118.5,34.2,-118.3,34.1'):
+            self.assertEqual(self.client.get('/api/games/%d/map/?bbox=%s' % (self.game.id, bbox)).status_code, 400)
+
+    def test_game_stats(self):
+        self.client.force_authenticate(self.killer)
+        self.client.post('/api/posts/%d/report/' % self.post.id)
+        url = '/api/games/%d/stats/' % self.game.id
+
+        with self.assertNumQueries(7):
+            before = self.client.get(url).data
+        self.assertEqual(before['players'], {'alive': 2, 'pending': 1})
+        self.assertEqual((before['awaiting_verification'], before['reports']['reports']), (1, 1))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).data, before)
+
+        self.client.force_authenticate(self.killed)
+        self.client.post('/api/posts/%d/verify/' % self.post.id)
+        after = self.client.get(url).data
+        self.assertEqual(after['players'], {'alive': 2, 'dead': 1})
+        self.assertEqual([k['user'] for k in after['top_killers']], [self.killer.id])
+        self.assertEqual(sum(d['kills'] for d in after['kills_per_day']), 1)
+
+    def test_comment_stream(self):
+        comments = [Comment.objects.create(post=self.post, commenter=self.killed, text='comment %d' % i)
+                    for i in range(5)]
+        CommentLike.objects.create(comment=comments[4], liker=self.killer)
+        self.client.force_authenticate(self.killer)
+        url = '/api/posts/%d/comments/' % self.post.id
+
+        with self.assertNumQueries(2):
+            latest = self.client.get(url, {'n': 3}).data
+        self.assertEqual([c['id'] for c in latest['comments']], [c.id for c in comments[2:]])
+        self.assertEqual([c['liked_by_me'] for c in latest['comments']], [False, False, True])
+        self.assertTrue(latest['has_more'])
+
+        older = self.client.get(url, {'n': 3, 'before': latest['before']}).data
+        self.assertEqual([c['id'] for c in older['comments']], [c.id for c in comments[:2]])
+        self.assertIsNone(older['before'])
+
+        self.assertEqual(self.client.get(url, {'since': latest['since']}).data['comments'], [])
+        new = Comment.objects.create(post=self.post, commenter=self.killer, text='new')
+        delta = self.client.get(url, {'since': latest['since']}).data
+        self.assertEqual([c['id'] for c in delta['comments']], [new.id])
+        self.assertEqual(self.client.get(url, {'since': 'garbage'}).status_code, 400)
+
+    def test_sparse_fields_and_expand(self):
+        response = self.client.get('/api/posts/', {'fields': 'id,status,poster', 'expand': 'poster'})
+        self.assertEqual(response.data['results'][0], {'id': self.post.id, 'status': 'p',
+                                                       'poster': {'id': self.killer.id, 'username': 'player0',
+                                                                  'first_name': '', 'last_name': ''}})
+
+        response = self.client.get('/api/posts/', {'fields': 'id,status', 'format': 'columnar'})
+        self.assertEqual(json.loads(response.content.decode())['results'],
+                         {'columns': ['id', 'status'], 'rows': [[self.post.id, 'p']]})
+
+    def test_counters_follow_writes(self):
+        self.client.force_authenticate(self.killer)
+        self.client.post('/api/posts/%d/like/' % self.post.id)
+        self.client.post('/api/posts/%d/report/' % self.post.id)
+        comment = Comment.objects.create(post=self.post, commenter=self.killer, text='got em')
+        CommentLike.objects.create(comment=comment, liker=self.killed)
+        self.client.post('/api/posts/%d/unlike/' % self.post.id)
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count, self.post.report_count), (0, 1, 1))
+        self.assertEqual(Comment.objects.get(pk=comment.pk).like_count, 1)
+
+        Post.objects.filter(pk=self.post.pk).update(like_count=7)
+        # one UPDATE per counter however many rows drifted
+        with self.assertNumQueries(len(counters.COUNTERS)):
+            self.assertEqual(counters.reconcile()[('Post', 'like_count')], 1)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).like_count, 0)
+
+
+# requests racing on separate connections to the test database, which is a file so they lock the way production does
+class ConcurrentKillTest(APITransactionTestCase):
+
+    def setUp(self):
+        self.game = Game.objects.create(status='r', name='Test Game', game_picture='game_pictures/test.jpg')
+        self.users = [User.objects.create(username='player%d' % i) for i in range(6)]
+        for user in self.users:
+            ring.insert(self.game, user)
+            leaderboard.add_player(self.game, user)
+        ring.start(self.game)
+        self.staff = User.objects.create(username='admin', is_staff=True)
+
+    # posts to every url at once, one thread each, and returns the status codes in order
+    def race(self, requests):
+        barrier = threading.Barrier(len(requests))
+        codes = [None] * len(requests)
+
+        def send(i, user, url, data=None):
+            client = APIClient()
+            client.force_authenticate(user)
+            barrier.wait()
+            try:
+                codes[i] = client.post(url, data, format='json').status_code
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=send, args=(i,) + r) for i, r in enumerate(requests)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return codes
+
+    def test_verify_races_admin_verify(self):
+        killer = self.users[0]
+        for _ in range(4):
+            killed = UserGameStatus.objects.get(user=killer, game=self.game).target
+            UserGameStatus.objects.filter(user=killed, game=self.game).update(status='p')
+            post = Post.objects.create(poster=killer, killed=killed, game=self.game, post_video='post_videos/test.mp4',
+                                       status='c', time_confirmed=timezone.now())
+
+            url = '/api/posts/%d/%s/'
+            verify, admin_verify = self.race([(killed, url % (post.id, 'verify')),
+                                              (self.staff, url % (post.id, 'admin_verify'))])
+            # whichever comes second finds the post resolved
+            self.assertIn((verify, admin_verify), [(202, 406), (409, 202)])
+
+        self.assertEqual(LeaderboardEntry.objects.get(user=killer, game=self.game).kills, 4)
+        self.assertEqual(ring.check_integrity(self.game), [])
+
+    def test_moderate_races_admin_verify(self):
+        # every other player around the ring kills their target
+        killer, posts = self.users[0], []
+        for _ in range(3):
+            killed = UserGameStatus.objects.get(user=killer, game=self.game).target
+            UserGameStatus.objects.filter(user=killed, game=self.game).update(status='p')
+            posts.append(Post.objects.create(poster=killer, killed=killed, game=self.game, status='c',
+                                             post_video='post_videos/test.mp4', time_confirmed=timezone.now()))
+            killer = UserGameStatus.objects.get(user=killed, game=self.game).target
+
+        moderate = (self.staff, '/api/posts/moderate/', {'verify': [p.id for p in posts]})
+        codes = self.race([moderate] + [(self.staff, '/api/posts/%d/admin_verify/' % p.id) for p in posts])
+        self.assertEqual(codes[0], 202)
+        self.assertEqual(Post.objects.filter(status='v').count(), 3)
+        self.assertEqual(sum(LeaderboardEntry.objects.values_list('kills', flat=True)), 3)
+        self.assertEqual(ring.check_integrity(self.game), [])
+
+    def test_batches_race_verify(self):
+        killer, killed = self.users[0], UserGameStatus.objects.get(user=self.users[0], game=self.game).target
+        UserGameStatus.objects.filter(user=killed, game=self.game).update(status='p')
+        post = Post.objects.create(poster=killer, killed=killed, game=self.game, post_video='post_videos/test.mp4',
+                                   status='c', time_confirmed=timezone.now())
+
+        batch = {'operations': [{'op': 'like', 'post': post.id}]}
+        requests = [(user, '/api/likes/batch/', batch) for user in self.users[2:]]
+        codes = self.race(requests + [(killed, '/api/posts/%d/verify/' % post.id)])
+        self.assertEqual(codes, [200] * len(requests) + [202])
+        self.assertEqual(Post.objects.get(pk=post.pk).like_count, len(requests))
+
+
+class LeaderboardTest(APITestCase):
+
+    def setUp(self):
+        self.game = Game.objects.create(status='r', name='Test Game', game_picture='game_pictures/test.jpg')
+        self.users = [User.objects.create(username='player%d' % i) for i in range(6)]
+        for user in self.users:
+            ring.insert(self.game, user)
+            leaderboard.add_player(self.game, user)
+
+    def kill(self, poster, killed):
+        ring.remove(self.game, killed)
+        post = Post.objects.create(poster=poster, killed=killed, game=self.game, post_video='post_videos/test.mp4',
+                                   post_thumbnail_image='post_thumbnail_image/test.jpg', status='v',
+                                   time_confirmed=timezone.now())
+        leaderboard.record_kill(post)
+
+    def board(self):
+        return list(LeaderboardEntry.objects.filter(game=self.game).order_by('user_id')
+                    .values_list('user_id', 'kills', 'rank', 'alive'))
+
+    def test_incremental_ranks_match_rebuild(self):
+        a, b, c, d, e, f = self.users
+        self.kill(a, b)
+        self.kill(c, d)
+        self.kill(a, e)
+        incremental = self.board()
+        self.assertEqual([r[2] for r in incremental], [1, 3, 2, 3, 3, 3])
+
+        leaderboard.rebuild(self.game)
+        self.assertEqual(self.board(), incremental)
+
+    def test_around_me(self):
+        self.kill(self.users[0], self.users[1])
+        self.client.force_authenticate(self.users[3])
+        response = self.client.get('/api/leaderboard/around_me/?game=%d&n=1' % self.game.id)
+        self.assertEqual([e['user'] for e in response.data], [self.users[2].id, self.users[3].id, self.users[4].id])
+
+        response = self.client.get('/api/leaderboard/top/?game=%d&n=1' % self.game.id)
+        self.assertEqual([e['user'] for e in response.data], [self.users[0].id])
+        self.assertEqual(self.client.get('/api/leaderboard/around_me/?game=abc').status_code, 400)
+
+    def test_pages_stay_put_when_ranks_move(self):
+        a, b, c, d, e, f = self.users
+        self.kill(a, b)
+        response = self.client.get('/api/leaderboard/?game=%d&page_size=2' % self.game.id)
+        seen = [entry['user'] for entry in response.data['results']]
+        # a player still to come overtakes the leader, which pushes every rank under the cursor down
+        self.kill(f, c)
+        self.kill(f, d)
+        url = response.data['next']
+        while url:
+            response = self.client.get(url)
+            seen += [entry['user'] for entry in response.data['results']]
+            url = response.data['next']
+        # f moved up past the cursor, everyone who kept their kill count shows up exactly once
+        self.assertEqual(seen, [a.id, b.id, c.id, d.id, e.id])
+
+    def test_rebuild_refreshes_game_stats(self):
+        cache.get_cache().clear()
+        post = Post.objects.create(poster=self.users[0], killed=self.users[1], game=self.game, status='p',
+                                   post_video='post_videos/test.mp4', time_confirmed=timezone.now())
+        url = '/api/games/%d/stats/' % self.game.id
+        self.assertEqual(self.client.get(url).data['top_killers'], [])
+
+        Post.objects.filter(pk=post.pk).update(status='v')
+        call_command('rebuild_leaderboard', self.game.id, stdout=StringIO())
+        self.assertEqual([k['user'] for k in self.client.get(url).data['top_killers']], [self.users[0].id])
+
+
+class BadgeTest(APITestCase):
+
+    def setUp(self):
+        self.game = Game.objects.create(status='r', name='Test Game', game_picture='game_pictures/test.jpg')
+        self.users = [User.objects.create(username='player%d' % i) for i in range(4)]
+        for user in self.users:
+            ring.insert(self.game, user)
+            leaderboard.add_player(self.game, user)
+        Game.objects.filter(pk=self.game.pk).update(status='p')
+
+    def kill_target(self, killer):
+        killed = UserGameStatus.objects.get(user=killer, game=self.game).target
+        post = Post.objects.create(poster=killer, killed=killed, game=self.game, post_video='post_videos/test.mp4',
+                                   post_thumbnail_image='post_thumbnail_image/test.jpg', status='p',
+                                   time_confirmed=timezone.now())
+        self.client.force_authenticate(killed)
+        self.assertEqual(self.client.post('/api/posts/%d/verify/' % post.id).status_code, 202)
+
+    def earned(self):
+        return set(Badge.objects.filter(game=self.game).values_list('user_id', 'type'))
+
+    def test_verified_kills_award_badges(self):
+        killer = self.users[0]
+        for _ in range(3):
+            self.kill_target(killer)
+
+        self.assertEqual(self.earned(), {(killer.id, 'f'), (killer.id, '3'), (killer.id, 'l'), (killer.id, 't'),
+                                         (killer.id, 'w')})
+
+    def test_recompute_matches_incremental(self):
+        self.kill_target(self.users[0])
+        self.kill_target(self.users[2])
+        incremental = self.earned()
+
+        badges.recompute(self.game)
+        self.assertEqual(self.earned(), incremental)
+
+
+class ResponseCacheTest(APITestCase):
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.game = Game.objects.create(status='r', name='Test Game', game_picture='game_pictures/test.jpg')
+        self.url = '/api/games/%d/' % self.game.id
+
+    def test_repeated_reads_skip_the_database(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_conditional_get(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.game.name = 'Renamed'
+        self.game.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'Renamed')
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(API_CACHE_TIMEOUT=1)
+    def test_etag_expires_with_the_response(self):
+        # setUp's write stored the version under the default timeout
+        cache.get_cache().clear()
+        etag = self.client.get(self.url)['ETag']
+        # a write from another process, which never bumps this process's version
+        Game.objects.filter(pk=self.game.pk).update(name='Renamed')
+        time.sleep(1.1)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.data['name']), (200, 'Renamed'))
+
+    def test_join_invalidates_statuses(self):
+        self.client.get('/api/statuses/')
+        user = User.objects.create(username='player')
+        self.client.force_authenticate(user)
+        self.client.post('/api/games/%d/join/' % self.game.id)
+        self.assertEqual(len(self.client.get('/api/statuses/').data['results']), 1)
+
+
+class UploadTest(APITestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+        self.user = User.objects.create(username='player')
+        self.client.force_authenticate(self.user)
+
+    def put_chunk(self, upload_id, data, start, total):
+        return self.client.put('/api/uploads/%s/' % upload_id, data, content_type='application/octet-stream',
+                               HTTP_CONTENT_RANGE='bytes %d-%d/%d' % (start, start + len(data) - 1, total))
+
+    def test_chunked_upload(self):
+        video = b'0123456789' * 10
+        upload_id = self.client.post('/api/uploads/', {'filename': 'kill.mp4', 'size': len(video)}).data['id']
+
+        self.assertEqual(self.put_chunk(upload_id, video[:40], 0, len(video)).data['offset'], 40)
+        # a retried chunk that no longer matches the offset tells the client where to resume
+        response = self.put_chunk(upload_id, video[:40], 0, len(video))
+        self.assertEqual((response.status_code, response.data['offset']), (409, 40))
+        self.assertEqual(self.client.post('/api/uploads/%s/finalize/' % upload_id).status_code, 409)
+
+        self.assertEqual(self.put_chunk(upload_id, video[40:], 40, len(video)).data['offset'], 100)
+        response = self.client.post('/api/uploads/%s/finalize/' % upload_id)
+        self.assertEqual(response.status_code, 202)
+
+        with open(os.path.join(self.media_root, Upload.objects.get(pk=upload_id).file.name), 'rb') as f:
+            self.assertEqual(f.read(), video)
+
+    def test_chunk_that_lost_a_race_conflicts(self):
+        video = b'0123456789' * 10
+        upload_id = self.client.post('/api/uploads/', {'filename': 'kill.mp4', 'size': len(video)}).data['id']
+        write_chunk = uploads.write_chunk
+
+        # another request records its chunk at the same offset while this one is still streaming
+        def racing_write_chunk(upload, stream):
+            Upload.objects.filter(pk=upload.pk).update(offset=40)
+            return write_chunk(upload, stream)
+
+        with mock.patch.object(uploads, 'write_chunk', racing_write_chunk):
+            response = self.put_chunk(upload_id, video[:30], 0, len(video))
+        self.assertEqual((response.status_code, response.data['offset']), (409, 40))
+        self.assertEqual(Upload.objects.get(pk=upload_id).offset, 40)
+
+    def test_purge_removes_abandoned_uploads(self):
+        video = b'0123456789'
+        finished = self.client.post('/api/uploads/', {'filename': 'kill.mp4', 'size': len(video)}).data['id']
+        self.put_chunk(finished, video, 0, len(video))
+        self.client.post('/api/uploads/%s/finalize/' % finished)
+        unfinished = self.client.post('/api/uploads/', {'filename': 'kill.mp4', 'size': len(video)}).data['id']
+        self.put_chunk(unfinished, video[:5], 0, len(video))
+        Upload.objects.update(created=timezone.now() - timedelta(days=2))
+
+        paths = [default_storage.path(Upload.objects.get(pk=finished).file.name),
+                 uploads.partial_path(Upload.objects.get(pk=unfinished))]
+        call_command('purge_uploads', stdout=StringIO())
+        self.assertFalse(Upload.objects.exists())
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+    def test_other_users_cannot_see_upload(self):
+        upload_id = self.client.post('/api/uploads/', {'filename': 'kill.mp4', 'size': 10}).data['id']
+        self.client.force_authenticate(User.objects.create(username='other'))
+        self.assertEqual(self.client.get('/api/uploads/%s/' % upload_id).status_code, 404)
+
+
+class MediaJobTest(APITestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.settings = override_settings(MEDIA_ROOT=self.media_root, FFMPEG_BINARY='missing-ffmpeg')
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+    def test_image_renditions(self):
+        buf = BytesIO()
+        Image.new('RGB', (2000, 1000)).save(buf, 'PNG')
+        game = Game(status='r', name='Test Game')
+        game.game_picture.save('game.png', ContentFile(buf.getvalue()))
+
+        job = processing.claim()
+        self.assertEqual(job.kind, processing.IMAGE_RENDITIONS)
+        self.assertTrue(processing.run(job))
+        self.assertIsNone(processing.claim())
+
+        with default_storage.open(processing.rendition_name(game.game_picture.name, 'medium')) as f:
+            self.assertEqual(Image.open(f).size, (640, 320))
+
+    def test_failing_job_is_retried_then_failed(self):
+        user = User.objects.create(username='player')
+        game = Game.objects.create(status='p', name='Test Game')
+        post = Post.objects.create(poster=user, killed=user, game=game, post_video='post_videos/test.mp4',
+                                   status='p', time_confirmed=timezone.now())
+        processing.enqueue(post, 'post_video', processing.WEB_VIDEO)
+
+        for _ in range(3):
+            self.assertFalse(processing.run(processing.claim()))
+        job = MediaJob.objects.get()
+        self.assertEqual(job.status, 'f')
+        self.assertIn('missing-ffmpeg', job.error)
+
+    def test_abandoned_job_is_reclaimed(self):
+        user = User.objects.create(username='player')
+        game = Game.objects.create(status='p', name='Test Game')
+        post = Post.objects.create(poster=user, killed=user, game=game, post_video='post_videos/test.mp4',
+                                   status='p', time_confirmed=timezone.now())
+        processing.enqueue(post, 'post_video', processing.WEB_VIDEO)
+
+        # the worker running it gets killed
+        job = processing.claim()
+        self.assertIsNone(processing.claim())
+        MediaJob.objects.filter(pk=job.pk).update(updated=timezone.now() - timedelta(hours=1))
+        self.assertEqual(processing.claim().attempts, 2)
+
+        MediaJob.objects.filter(pk=job.pk).update(attempts=3, updated=timezone.now() - timedelta(hours=1))
+        self.assertIsNone(processing.claim())
+        self.assertEqual(MediaJob.objects.get().status, 'f')
+
+
+class MediaServingTest(APITestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+        os.makedirs(os.path.join(self.media_root, 'post_videos'))
+        with open(os.path.join(self.media_root, 'post_videos', 'kill.mp4'), 'wb') as f:
+            f.write(b'0123456789')
+        self.url = '/media/post_videos/kill.mp4'
+
+    def test_whole_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=20-').status_code, 416)
+
+    def test_conditional_get(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get('/media/../settings.py').status_code, 404)
+
+    def test_accel_redirect(self):
+        with override_settings(MEDIA_SENDFILE_BACKEND='x-accel-redirect'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/post_videos/kill.mp4')
+        self.assertEqual(response.content, b'')
+
+
+# events go out on commit, which a TestCase never does
+class EventStreamTest(APITransactionTestCase):
+
+    def setUp(self):
+        events.broker = events.LocalBroker()
+        self.game = Game.objects.create(status='r', name='Test Game', game_picture='game_pictures/test.jpg')
+        self.users = [User.objects.create(username='player%d' % i) for i in range(3)]
+        for user in self.users:
+            ring.insert(self.game, user)
+
+    def drain(self, subscription):
+        received = []
+        while not subscription.queue.empty():
+            received.append(subscription.queue.get())
+        return received
+
+    def test_targets_only_reach_their_player(self):
+        mine = events.get_broker().subscribe(self.users[0].pk, self.game.pk)
+        other = events.get_broker().subscribe(self.users[1].pk, self.game.pk)
+        self.addCleanup(mine.close)
+        self.addCleanup(other.close)
+
+        ring.shuffle(self.game)
+        target = UserGameStatus.objects.get(user=self.users[0], game=self.game).target_id
+        self.assertEqual([(e.type, e.data) for e in self.drain(mine)],
+                         [('target_assigned', {'user': self.users[0].pk, 'target': target})])
+        self.assertEqual([e.data['user'] for e in self.drain(other)], [self.users[1].pk])
+
+    def test_post_reaches_everyone_in_game(self):
+        watcher = events.get_broker().subscribe(self.users[2].pk, self.game.pk)
+        elsewhere = events.get_broker().subscribe(self.users[2].pk, self.game.pk + 1)
+        self.addCleanup(watcher.close)
+        self.addCleanup(elsewhere.close)
+
+        post = Post.objects.create(poster=self.users[0], killed=self.users[1], game=self.game,
+                                   post_video='post_videos/test.mp4', status='p', time_confirmed=timezone.now())
+        Comment.objects.create(post=post, commenter=self.users[1], text='nope')
+        self.assertEqual([e.type for e in self.drain(watcher)], ['post_created', 'comment_created'])
+        self.assertEqual(self.drain(elsewhere), [])
+
+    def test_stream(self):
+        self.client.force_authenticate(self.users[0])
+        events.get_broker().publish('post_created', self.game.pk, {'post': 1})
+        last_event_id = events.get_broker().history[-1][1].id
+        event = events.get_broker().publish('post_created', self.game.pk, {'post': 2})
+        response = self.client.get('/api/events/?game=%d' % self.game.pk, HTTP_ACCEPT='text/event-stream',
+                                   HTTP_LAST_EVENT_ID=last_event_id)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = iter(response.streaming_content)
+        self.assertEqual(next(stream), b'retry: 3000\n\n')
+        self.assertEqual(next(stream), event.encode().encode('utf-8'))
+        response.close()
+        self.assertEqual(events.get_broker().subscriptions, set())
+
+    def test_id_from_before_restart_replays_everything(self):
+        old = events.get_broker().publish('post_created', self.game.pk, {'post': 1})
+        events.broker = events.LocalBroker()
+        events.broker.epoch = 'restarted'
+        replayed = [events.get_broker().publish('post_created', self.game.pk, {'post': n}) for n in (2, 3)]
+
+        subscription = events.get_broker().subscribe(self.users[0].pk, self.game.pk, old.id)
+        self.addCleanup(subscription.close)
+        self.assertEqual(self.drain(subscription), replayed)
+
+    def test_bad_last_event_id(self):
+        self.client.force_authenticate(self.users[0])
+        response = self.client.get('/api/events/', HTTP_LAST_EVENT_ID='12')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(PROFILING_ENABLED=True)
+class ProfilingTest(APITestCase):
+
+    def setUp(self):
+        profiling.reset()
+        self.addCleanup(profiling.reset)
+        self.staff = User.objects.create(username='admin', is_staff=True)
+        Game.objects.create(status='r', name='Test Game', game_picture='game_pictures/test.jpg')
+
+    def test_records_views(self):
+        self.client.get('/api/games/')
+        self.client.get('/api/games/')
+        self.client.force_authenticate(self.staff)
+        stats = self.client.get('/api/profiling/').data['GET game-list']
+        self.assertEqual(stats['requests'], 2)
+        self.assertGreater(stats['queries']['max'], 0)
+        self.assertEqual(sum(stats['histogram'].values()), 2)
+
+    def test_logs_slow_requests(self):
+        token = Token.objects.create(user=self.staff)
+        with override_settings(PROFILING_SLOW_REQUEST_MS=0), self.assertLogs('assassin_game.profiling') as logs:
+            self.client.get('/api/games/', HTTP_AUTHORIZATION='Token %s' % token.key)
+        self.assertIn('"sql": [', logs.output[0])
+        self.assertIn('authtoken_token', logs.output[0])
+        self.assertNotIn(token.key, logs.output[0])
+
+
+class BenchmarkTest(APITestCase):
+
+    def test_scenarios_run_cleanly(self):
+        report = benchmark.run(players=10, posts=20, comments=10, likes=20, requests=6)
+        for name in benchmark.SCENARIOS:
+            self.assertEqual(report['scenarios'][name]['requests'], 6)
+            self.assertEqual(report['scenarios'][name]['errors'], 0)
+        self.assertEqual(ring.check_integrity(Game.objects.get(name='bench game')), [])
+
+
+class TokenCacheTest(APITestCase):
+
+    def setUp(self):
+        authentication.local.clear()
+        cache.get_cache().clear()
+        self.user = User.objects.create(username='player')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_token_lookup_is_cached(self):
+        self.assertEqual(self.client.get('/api/badges/').status_code, 200)
+        authentication.local.clear()
+        # the badge list is cached too, so the only query left would be the token lookup
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/badges/').status_code, 200)
+
+    def test_only_flags_are_cached(self):
+        self.user.set_password('hunter22')
+        self.user.save()
+        self.client.get('/api/badges/')
+        self.assertEqual(cache.get_cache().get(authentication.cache_key(self.token.key)),
+                         (self.user.pk, True, False, False))
+
+        user, token = authentication.CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.assertEqual((user.pk, token.key), (self.user.pk, self.token.key))
+        with self.assertNumQueries(1):
+            self.assertEqual(user.username, 'player')
+
+    def test_deactivation_and_token_delete_invalidate(self):
+        self.client.get('/api/badges/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/badges/').status_code, 401)
+
+        self.user.is_active = True
+        self.user.save()
+        self.client.get('/api/badges/')
+        self.token.delete()
+        self.assertEqual(self.client.get('/api/badges/').status_code, 401)
+
+
+class SearchTest(APITestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create(username='alice', first_name='Alice', last_name='Liddell')
+        self.bob = User.objects.create(username='bob', first_name='Robert', last_name='Alison')
+        Player.objects.create(user=self.alice, year='2017', profile_picture='profile_pictures/a.jpg')
+        Player.objects.create(user=self.bob, year='2017', profile_picture='profile_pictures/b.jpg')
+        game = Game.objects.create(status='p', name='Test Game', game_picture='game_pictures/test.jpg')
+        self.post = Post.objects.create(poster=self.alice, killed=self.bob, game=game, caption='ambush at the library',
+                                        post_video='post_videos/test.mp4', status='v', time_confirmed=timezone.now())
+        Post.objects.create(poster=self.bob, killed=self.alice, game=game, caption='lunch break',
+                            post_video='post_videos/test.mp4', status='p', time_confirmed=timezone.now())
+
+    def search(self, query, type):
+        response = self.client.get('/api/search/', {'q': query, 'type': type})
+        return [r['id'] for r in response.data[type]]
+
+    def check_results(self):
+        self.assertEqual(set(self.search('ali', 'users')), {self.alice.id, self.bob.id})
+        self.assertEqual(self.search('rob', 'users'), [self.bob.id])
+        self.assertEqual(self.search('library amb', 'posts'), [self.post.id])
+
+        self.post.caption = 'sniped'
+        self.post.save()
+        self.assertEqual(self.search('library', 'posts'), [])
+        self.assertEqual(self.search('snip', 'posts'), [self.post.id])
+
+    def test_fts(self):
+        self.assertTrue(search.installed())
+        self.check_results()
+
+    def test_like_fallback(self):
+        search.checked['default'] = False
+        self.addCleanup(search.checked.pop, 'default')
+        self.check_results()
@@ -0,0 +1,68 @@
+import os
+import re
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http.request import UnreadablePostError
+from django.utils.text import get_valid_filename
+
+CHUNK_READ_SIZE = 64 * 1024
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+
+def max_upload_size():
+    return getattr(settings, 'MAX_VIDEO_UPLOAD_SIZE', 200 * 1024 * 1024)
+
+
+def partial_path(upload):
+    return os.path.join(settings.MEDIA_ROOT, 'post_videos', 'partial', '%s.part' % upload.pk)
+
+
+# the offset a chunk claims to start at, from Content-Range (bytes 0-1023/4096) or ?offset=
+def chunk_offset(request):
+    content_range = request.META.get('HTTP_CONTENT_RANGE')
+    if content_range:
+        match = CONTENT_RANGE.match(content_range.strip())
+        return int(match.group(1)) if match else None
+
+    try:
+        return int(request.query_params['offset'])
+    except (KeyError, ValueError):
+        return None
+
+
+# streams the request body onto the partial file at upload.offset, CHUNK_READ_SIZE bytes at a time, and returns
+# the number of bytes written. a dropped connection keeps whatever arrived so the client can resume from there.
+# the file isn't truncated: a chunk that lost a race for its offset mustn't cut off the one that won, and bytes
+# past the recorded offset get overwritten by the next chunk anyway
+def write_chunk(upload, stream):
+    path = partial_path(upload)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    written = 0
+    remaining = upload.size - upload.offset
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+        f.seek(upload.offset)
+        while remaining > 0:
+            try:
+                data = stream.read(min(CHUNK_READ_SIZE, remaining))
+            except (IOError, UnreadablePostError):
+                break
+            if not data:
+                break
+            f.write(data)
+            written += len(data)
+            remaining -= len(data)
+    return written
+
+
+# moves the assembled file next to the regular post videos and returns its storage name
+def finalize(upload):
+    name = default_storage.get_available_name('post_videos/%s' % get_valid_filename(upload.filename))
+    os.rename(partial_path(upload), default_storage.path(name))
+    return name
+
+
+def discard(upload):
+    if os.path.exists(partial_path(upload)):
+        os.remove(partial_path(upload))
@@ -12,7 +12,12 @@ router.register(r'comments', views.CommentViewSet)
 router.register(r'comment-likes', views.CommentLikeViewSet)
 router.register(r'badges', views.BadgeViewSet)
 router.register(r'reports', views.ReportViewSet)
+router.register(r'leaderboard', views.LeaderboardViewSet)
+router.register(r'uploads', views.UploadViewSet)
 
 urlpatterns = [
+    url(r'^events/$', views.EventStreamView.as_view(), name='events'),
+    url(r'^profiling/$', views.ProfilingView.as_view(), name='profiling'),
+    url(r'^search/$', views.SearchView.as_view(), name='search'),
     url(r'^', include(router.urls)),
 ]
@@ -1,153 +1,331 @@
+import math
 from rest_framework import viewsets
 from rest_framework.response import Response
-from assassin_game.models import Game, Post, UserGameStatus, Like, Comment, CommentLike, Badge, Report
-from assassin_game.serializers import (GameSerializer, UserSerializer, PostSerializer, UserGameStatusSerializer,
-                                       LikeSerializer, CommentSerializer, CommentLikeSerializer, BadgeSerializer,
-                                       ReportSerializer)
+from assassin_game.models import (Game, Post, UserGameStatus, Like, Comment, CommentLike, Badge, Report,
+                                  LeaderboardEntry, Upload)
+from assassin_game.serializers import (GameSerializer, UserSerializer, PostSerializer, FeedPostSerializer,
+                                       UserGameStatusSerializer, LikeSerializer, CommentSerializer,
+                                       CommentLikeSerializer, BadgeSerializer, ReportSerializer,
+                                       LeaderboardEntrySerializer, UploadSerializer, ReactionSerializer,
+                                       CommentStreamSerializer)
+from assassin_game.pagination import (FeedCursorPagination, LeaderboardCursorPagination, ModerationCursorPagination,
+                                      time_cursor, parse_time_cursor)
+from assassin_game import (cache, events, killmap, leaderboard, moderation, processing, profiling, reactions, ring,
+                           search, stats, uploads)
+from assassin_game.idempotency import idempotent
+from assassin_game.signals import post_verified
+from assassin_game.cache import CachedResponseMixin
 from rest_framework import status
+from django.conf import settings
 from django.contrib.auth.models import User
-from rest_framework.decorators import detail_route
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Exists, F, OuterRef, Q, Value
+from rest_framework.decorators import detail_route, list_route
 from rest_framework import mixins
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
+from django.http import StreamingHttpResponse
 from rest_framework.exceptions import ValidationError
 from django.utils import timezone
 
 
+# updates row pk of queryset and returns whether it matched. state changing views call this first thing in their
+# transaction: an UPDATE takes the write lock before anything is read, so a racing request waits its turn. on sqlite
+# select_for_update does nothing and two transactions that both read first deadlock on "database is locked"
+def update_first(queryset, pk, **values):
+    try:
+        return bool(queryset.filter(pk=int(pk)).update(**values))
+    except (TypeError, ValueError):
+        # get_object answers 404 for these
+        return False
+
+
 # pretty much done with game view set
-class GameViewSet(viewsets.ReadOnlyModelViewSet):
+class GameViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Game.objects.all()
     serializer_class = GameSerializer
+    cache_namespace = 'games'
 
     @detail_route(methods=['post'])
+    @idempotent
+    @transaction.atomic
     def join(self, request, pk=None):
-
-        game = self.get_object()
         user = request.user
+        # lock the game so a join can't slip in while the game is being started
+        registering = user.is_authenticated() and update_first(Game.objects.filter(status='r'), pk, status='r')
+        game = self.get_object()
 
         if not user.is_authenticated():
             return Response({"Error": "User is not authenticated"}, status=status.HTTP_406_NOT_ACCEPTABLE)
-
-        if game.status != 'r':
+        if not registering:
             return Response({"Error": "Game isn't in registration status"}, status=status.HTTP_406_NOT_ACCEPTABLE)
 
-        existing = UserGameStatus.objects.filter(user=user, game=game)
-        statuses = UserGameStatus.objects.filter(game=game)
-        if existing.count() > 0:
+        existing = UserGameStatus.objects.filter(user=user, game=game).first()
+        if existing is not None:
             print('User already joined game')
-            res = UserGameStatusSerializer(existing.first(), context={'request': request})
+            res = UserGameStatusSerializer(existing, context={'request': request})
             return Response(res.data, status=status.HTTP_409_CONFLICT)
 
-        elif statuses.count() == 0:
-            print('Creating first user status')
-            target = request.user
-            s = UserGameStatus.objects.create(user=user, target=target, game=game, status='a')
-            res = UserGameStatusSerializer(s, context={'request': request})
-            return Response(res.data, status=status.HTTP_201_CREATED)
+        s = ring.insert(game, user)
+        leaderboard.add_player(game, user)
+        res = UserGameStatusSerializer(s, context={'request': request})
+        return Response(res.data, status=status.HTTP_201_CREATED)
 
-        else:
-            print('Adding another user status')
-            first = statuses.first()
-            target = first.target
-            first.target = user
-            first.save()
-            s = UserGameStatus.objects.create(user=user, target=target, game=game, status='a')
-            res = UserGameStatusSerializer(s, context={'request': request})
-            return Response(res.data, status=status.HTTP_201_CREATED)
+    # counts for the organizers' dashboard, cached until something in the game changes
+    @detail_route(methods=['get'])
+    def stats(self, request, pk=None):
+        game = self.get_object()
+        return self.cached_response(cache.game_namespace(game.pk), lambda request: Response(stats.snapshot(game)),
+                                    request)
+
+    # ?bbox=west,south,east,north&zoom=z. zoomed out the kills come as heatmap cells, zoomed in as single kills
+    # unless there are too many of them to draw
+    @detail_route(methods=['get'])
+    def map(self, request, pk=None):
+        game = self.get_object()
+        try:
+            west, south, east, north = [float(v) for v in request.query_params['bbox'].split(',')]
+            zoom = int(request.query_params.get('zoom', 16))
+            # float() takes nan and inf, which no grid cell can be computed for
+            if not all(math.isfinite(v) for v in (west, south, east, north)) or south > north:
+                raise ValueError
+        except (KeyError, ValueError):
+            return Response({"Error": "bbox=west,south,east,north of finite numbers with south <= north and an "
+                                      "integer zoom are required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if zoom >= getattr(settings, 'KILL_MAP_POINTS_ZOOM', 17):
+            limit = getattr(settings, 'KILL_MAP_MAX_POINTS', 500)
+            kills = list(killmap.kills_in(game, south, west, north, east).order_by('-time_confirmed').values(
+                'id', 'latitude', 'longitude', 'poster', 'killed', 'time_confirmed')[:limit + 1])
+            if len(kills) <= limit:
+                return Response({"type": "kills", "kills": kills})
+            zoom = max(killmap.zooms())
+
+        grid, cells = killmap.cells_in(game, zoom, south, west, north, east)
+        cells = [{"x": c.x, "y": c.y, "kills": c.kills, "latitude": c.latitude_sum / c.kills,
+                  "longitude": c.longitude_sum / c.kills} for c in cells if c.kills]
+        return Response({"type": "cells", "zoom": grid, "cell_size": killmap.cell_size(grid), "cells": cells})
 
 
 # needs some work (especially token authentication and stuff)
 class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+    queryset = User.objects.select_related('player')
     serializer_class = UserSerializer
     filter_fields = ['username']
 
 
 # almost done (make sure corner case stuff like posting/verifying twice is good)
 class PostViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
-    queryset = Post.objects.all()
+    queryset = Post.objects.select_related('poster', 'killed', 'game')
     serializer_class = PostSerializer
     filter_fields = ['poster', 'killed', 'game', 'status']
 
+    @list_route(methods=['get'])
+    def feed(self, request):
+        user = request.user
+        if user.is_authenticated():
+            liked_by_me = Exists(Like.objects.filter(post=OuterRef('pk'), liker=user))
+        else:
+            liked_by_me = Value(False, output_field=BooleanField())
+
+        queryset = self.filter_queryset(self.get_queryset()).annotate(
+            poster_username=F('poster__username'),
+            killed_username=F('killed__username'),
+            liked_by_me=liked_by_me,
+        )
+
+        paginator = FeedCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        res = FeedPostSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(res.data)
+
+    # the latest ?n= comments of the post, oldest first. ?before= pages back through older ones and ?since= returns
+    # only what was added after a cursor, so an open comment sheet polls for new comments instead of refetching
+    @detail_route(methods=['get'])
+    def comments(self, request, pk=None):
+        post = self.get_object()
+        user = request.user
+        try:
+            n = max(1, min(int(request.query_params.get('n', 20)), 100))
+        except ValueError:
+            n = 20
+
+        cursors = {}
+        for name in ('since', 'before'):
+            value = request.query_params.get(name)
+            cursors[name] = parse_time_cursor(value) if value else None
+            if value and cursors[name] is None:
+                return Response({"Error": "Invalid %s cursor" % name}, status=status.HTTP_400_BAD_REQUEST)
+        since, before = cursors['since'], cursors['before']
+
+        if user.is_authenticated():
+            liked_by_me = Exists(CommentLike.objects.filter(comment=OuterRef('pk'), liker=user))
+        else:
+            liked_by_me = Value(False, output_field=BooleanField())
+        comments = Comment.objects.filter(post=post).annotate(commenter_username=F('commenter__username'),
+                                                              liked_by_me=liked_by_me)
+
+        # one extra row tells whether there is more past the window
+        if since is not None:
+            comments = list(comments.filter(Q(time__gt=since[0]) | Q(time=since[0], id__gt=since[1]))
+                            .order_by('time', 'id')[:n + 1])
+            has_more = len(comments) > n
+            comments = comments[:n]
+        else:
+            if before is not None:
+                comments = comments.filter(Q(time__lt=before[0]) | Q(time=before[0], id__lt=before[1]))
+            comments = list(comments.order_by('-time', '-id')[:n + 1])
+            has_more = len(comments) > n
+            comments = list(reversed(comments[:n]))
+
+        res = CommentStreamSerializer(comments, many=True, context=self.get_serializer_context())
+        newest = time_cursor(comments[-1].time, comments[-1].pk) if comments else request.query_params.get('since')
+        oldest = time_cursor(comments[0].time, comments[0].pk) if comments else None
+        return Response({
+            "comments": res.data,
+            "since": newest,
+            "before": oldest if since is None and has_more else None,
+            "has_more": has_more,
+        })
+
+    @list_route(methods=['get'])
+    def moderation(self, request):
+        user = request.user
+        if not user.is_authenticated() or not user.is_staff:
+            return Response({"Error": "User is not an admin"}, status=status.HTTP_406_NOT_ACCEPTABLE)
+
+        queryset = self.filter_queryset(moderation.queue().select_related('poster', 'killed', 'game'))
+        paginator = ModerationCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        res = PostSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(res.data)
+
+    # {"verify": [post ids], "deny": [post ids]}, all resolved in one transaction. posts that aren't conflicting
+    # (anymore) come back under "skipped"
+    @list_route(methods=['post'])
+    @idempotent
+    @transaction.atomic
+    def moderate(self, request):
+        user = request.user
+        if not user.is_authenticated() or not user.is_staff:
+            return Response({"Error": "User is not an admin"}, status=status.HTTP_406_NOT_ACCEPTABLE)
+
+        if not isinstance(request.data, dict):
+            return Response({"Error": "Expected an object with verify and deny"}, status=status.HTTP_400_BAD_REQUEST)
+        verify, deny = request.data.get('verify', []), request.data.get('deny', [])
+        try:
+            # a string is iterable too, "12" would come out as posts 1 and 2
+            if not isinstance(verify, list) or not isinstance(deny, list):
+                raise TypeError
+            verify = [int(pk) for pk in verify]
+            deny = [int(pk) for pk in deny]
+        except (TypeError, ValueError):
+            return Response({"Error": "verify and deny must be lists of post ids"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if set(verify) & set(deny):
+            return Response({"Error": "A post can't be both verified and denied"}, status=status.HTTP_400_BAD_REQUEST)
+
+        verified = [p.pk for p in moderation.resolve(verify, True)]
+        denied = [p.pk for p in moderation.resolve(deny, False)]
+        skipped = [pk for pk in verify + deny if pk not in verified and pk not in denied]
+        return Response({"verified": verified, "denied": denied, "skipped": skipped}, status=status.HTTP_202_ACCEPTED)
+
+    # moves post pk from one of `current` to `new` and returns whether it did, a request that lost the race
+    # matches no row
+    def transition(self, pk, current, new, **filters):
+        values = {'status': new}
+        if new == 'v':
+            values['time_confirmed'] = timezone.now()
+        return update_first(Post.objects.filter(status__in=current, **filters), pk, **values)
+
     @detail_route(methods=['post'])
+    @idempotent
+    @transaction.atomic
     def admin_deny(self, request, pk=None):
-        post = self.get_object()
         user = request.user
+        moved = user.is_authenticated() and user.is_staff and self.transition(pk, ('c',), 'd')
+        post = self.get_object()
 
         if not user.is_authenticated() or not user.is_staff:
             return Response({"Error": "User is not an admin"}, status=status.HTTP_406_NOT_ACCEPTABLE)
-        elif post.status != 'c':
+        elif not moved:
             return Response({"Error": "Post is not conflicting"}, status=status.HTTP_406_NOT_ACCEPTABLE)
         else:
-            killed_status = UserGameStatus.objects.filter(user=post.killed, game=post.game).first()
-            killed_status.status = 'a'
-            killed_status.save()
-            post.status = 'd'
+            # only a pending player comes back to life, they may have been killed by another post since
+            UserGameStatus.objects.filter(user=post.killed, game=post.game, status='p').update(status='a')
+            # saved again for the post_save receivers, the transition was a queryset update
             post.save()
             res = PostSerializer(post)
             return Response(res.data, status=status.HTTP_202_ACCEPTED)
 
     @detail_route(methods=['post'])
+    @idempotent
+    @transaction.atomic
     def admin_verify(self, request, pk=None):
-        post = self.get_object()
         user = request.user
+        moved = user.is_authenticated() and user.is_staff and self.transition(pk, ('c',), 'v')
+        post = self.get_object()
 
         if not user.is_authenticated() or not user.is_staff:
             return Response({"Error": "User is not an admin"}, status=status.HTTP_406_NOT_ACCEPTABLE)
-        elif post.status != 'c':
+        elif not moved:
             return Response({"Error": "Post is not conflicting"}, status=status.HTTP_406_NOT_ACCEPTABLE)
         else:
-            has_killed_status = UserGameStatus.objects.filter(target=post.killed, game=post.game, status='a').first()
-            if has_killed_status is None:
-                has_killed_status = UserGameStatus.objects.filter(target=post.killed, game=post.game, status='p').first()
-            killed_status = UserGameStatus.objects.filter(user=post.killed, game=post.game).first()
-            has_killed_status.target = killed_status.target
-            killed_status.status = 'd'
-            post.status = 'v'
-            post.time_confirmed = timezone.now()
-            has_killed_status.save()
-            killed_status.save()
+            try:
+                ring.remove(post.game, post.killed)
+            except ValueError:
+                # killed by another post since this one was denied
+                transaction.set_rollback(True)
+                return Response({"Error": "Killed player is already dead"}, status=status.HTTP_409_CONFLICT)
             post.save()
+            leaderboard.record_kill(post)
+            post_verified.send(sender=Post, post=post)
             res = PostSerializer(post)
             return Response(res.data, status=status.HTTP_202_ACCEPTED)
 
-
-
     @detail_route(methods=['post'])
+    @idempotent
+    @transaction.atomic
     def verify(self, request, pk=None):
-        post = self.get_object()
         user = request.user
+        moved = user.is_authenticated() and self.transition(pk, ('p', 'c'), 'v', killed=user)
+        post = self.get_object()
 
         if not user.is_authenticated() or user != post.killed:
             return Response(status=status.HTTP_406_NOT_ACCEPTABLE)
+        elif not moved:
+            return Response({"Error": "Post has already been resolved"}, status=status.HTTP_409_CONFLICT)
         else:
-            # poster_status = UserGameStatus.objects.filter(user=post.poster, game=post.game).first()
-            has_killed_status = UserGameStatus.objects.filter(target=user, game=post.game, status='a').first()
-            if has_killed_status is None:
-                has_killed_status = UserGameStatus.objects.filter(target=user, game=post.game, status='p').first()
-            killed_status = UserGameStatus.objects.filter(user=user, game=post.game).first()
-            has_killed_status.target = killed_status.target
-            killed_status.status = 'd'
-            post.status = 'v'
-            post.time_confirmed = timezone.now()
-            has_killed_status.save()
-            killed_status.save()
+            try:
+                ring.remove(post.game, user)
+            except ValueError:
+                transaction.set_rollback(True)
+                return Response({"Error": "Killed player is already dead"}, status=status.HTTP_409_CONFLICT)
             post.save()
+            leaderboard.record_kill(post)
+            post_verified.send(sender=Post, post=post)
             res = PostSerializer(post)
             return Response(res.data, status=status.HTTP_202_ACCEPTED)
 
     @detail_route(methods=['post'])
+    @idempotent
+    @transaction.atomic
     def deny(self, request, pk=None):
-        post = self.get_object()
         user = request.user
+        moved = user.is_authenticated() and self.transition(pk, ('p',), 'c', killed=user)
+        post = self.get_object()
 
         if not user.is_authenticated() or user != post.killed:
             return Response(status=status.HTTP_406_NOT_ACCEPTABLE)
+        elif not moved:
+            return Response({"Error": "Post is not pending"}, status=status.HTTP_409_CONFLICT)
         else:
-            post.status = 'c'
             post.save()
             res = PostSerializer(post)
             return Response(res.data, status=status.HTTP_202_ACCEPTED)
 
     @detail_route(methods=['post'])
+    @idempotent
     def like(self, request, pk=None):
         post = self.get_object()
         user = request.user
@@ -155,15 +333,18 @@ class PostViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.Retriev
         if not user.is_authenticated():
             return Response({"Error": "User is not authenticated"}, status=status.HTTP_406_NOT_ACCEPTABLE)
 
-        existing = Like.objects.filter(post=post, liker=user)
-        if existing.count() > 0:
+        # the unique constraint decides races between double taps, no need to count first
+        try:
+            with transaction.atomic():
+                like = Like.objects.create(post=post, liker=user)
+        except IntegrityError:
             return Response({"Error": "User already liked post"}, status=status.HTTP_409_CONFLICT)
-        else:
-            like = Like.objects.create(post=post, liker=user)
-            res = LikeSerializer(like)
-            return Response(res.data, status=status.HTTP_202_ACCEPTED)
+
+        res = LikeSerializer(like)
+        return Response(res.data, status=status.HTTP_202_ACCEPTED)
 
     @detail_route(methods=['post'])
+    @idempotent
     def unlike(self, request, pk=None):
         post = self.get_object()
         user = request.user
@@ -171,17 +352,17 @@ class PostViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.Retriev
         if not user.is_authenticated():
             return Response({"Error": "User is not authenticated"}, status=status.HTTP_406_NOT_ACCEPTABLE)
 
-        existing = Like.objects.filter(post=post, liker=user)
+        like = Like.objects.filter(post=post, liker=user).first()
 
-        if existing.count() == 0:
+        if like is None:
             return Response({"Error": "User hasn't liked post"}, status=status.HTTP_409_CONFLICT)
         else:
-            like = existing.first()
             res = LikeSerializer(like)
-            existing.delete()
+            like.delete()
             return Response(res.data, status=status.HTTP_202_ACCEPTED)
 
     @detail_route(methods=['post'])
+    @idempotent
     def report(self, request, pk=None):
         post = self.get_object()
         user = request.user
@@ -189,14 +370,20 @@ class PostViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.Retriev
         if not user.is_authenticated():
             return Response({"Error": "User is not authenticated"}, status=status.HTTP_406_NOT_ACCEPTABLE)
 
-        existing = Report.objects.filter(post=post, reporter=user)
-        if existing.count() > 0:
+        try:
+            with transaction.atomic():
+                report = Report.objects.create(post=post, reporter=user)
+        except IntegrityError:
             return Response({"Error": "User already reported post"}, status=status.HTTP_409_CONFLICT)
-        else:
-            report = Report.objects.create(post=post, reporter=user)
-            res = ReportSerializer(report)
-            return Response(res.data, status=status.HTTP_202_ACCEPTED)
 
+        res = ReportSerializer(report)
+        return Response(res.data, status=status.HTTP_202_ACCEPTED)
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super(PostViewSet, self).create(request, *args, **kwargs)
+
+    @transaction.atomic
     def perform_create(self, serializer):
         user = self.request.user
 
@@ -204,28 +391,39 @@ class PostViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.Retriev
             raise ValidationError('You need to log in')
 
         game = serializer.validated_data['game']
-        user_status = UserGameStatus.objects.filter(user=user, game=game).first()
-        if user_status is None or user_status.status != 'a':
+        # writing the poster's status first locks it (the whole database on sqlite, see update_first), which
+        # serializes concurrent submissions from the same player
+        alive = UserGameStatus.objects.filter(user=user, game=game, status='a').update(status='a')
+        user_status = UserGameStatus.objects.select_related('target').filter(user=user, game=game).first()
+        if not alive:
             raise ValidationError('You are not alive')
         if game.status != 'p':
             raise ValidationError('The game has not started')
 
         killed = user_status.target
         stat = 'p'
-        existing = Post.objects.filter(poster=user, killed=killed, status=stat)
-        if existing.count() > 0:
+        if Post.objects.filter(poster=user, killed=killed, status=stat).exists():
             raise ValidationError('Previous kill still pending')
 
-        killed_status = UserGameStatus.objects.filter(user=killed, game=game).first()
-        killed_status.status = 'p'
-        killed_status.save()
-        serializer.save(poster=user, killed=killed, status=stat, time_confirmed=timezone.now())
+        extra = {}
+        upload = serializer.validated_data.pop('upload', None)
+        if upload is not None:
+            if upload.user_id != user.pk:
+                raise ValidationError('Upload belongs to another user')
+            extra['post_video'] = upload.file.name
+
+        UserGameStatus.objects.filter(user=killed, game=game).update(status='p')
+        post = serializer.save(poster=user, killed=killed, status=stat, time_confirmed=timezone.now(), **extra)
+        if upload is not None:
+            upload.delete()
+        processing.enqueue_post(post)
 
 
 # pretty much done (need to add tests)
-class UserGameStatusViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = UserGameStatus.objects.all()
+class UserGameStatusViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = UserGameStatus.objects.select_related('user', 'target', 'game')
     serializer_class = UserGameStatusSerializer
+    cache_namespace = 'statuses'
     filter_fields = ['user', 'game', 'status']
 
 
@@ -234,10 +432,30 @@ class LikeViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Like.objects.all()
     serializer_class = LikeSerializer
     filter_fields = ['post', 'liker']
+    max_batch_size = 500
 
     def perform_create(self, serializer):
         serializer.save(liker=self.request.user)
 
+    # reactions the app queued while offline, post and comment likes mixed, flushed in one request
+    @list_route(methods=['post'])
+    @idempotent
+    def batch(self, request):
+        user = request.user
+        if not user.is_authenticated():
+            return Response({"Error": "User is not authenticated"}, status=status.HTTP_406_NOT_ACCEPTABLE)
+
+        data = request.data.get('operations') if isinstance(request.data, dict) else request.data
+        operations = ReactionSerializer(data=data, many=True)
+        operations.is_valid(raise_exception=True)
+        if len(operations.validated_data) > self.max_batch_size:
+            return Response({"Error": "At most %d operations per batch" % self.max_batch_size},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = reactions.apply_batch(user, operations.validated_data)
+        res = [dict(op, status=result) for op, result in zip(operations.validated_data, results)]
+        return Response({"results": res}, status=status.HTTP_200_OK)
+
 
 class ReportViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Report.objects.all()
@@ -251,11 +469,12 @@ class ReportViewSet(viewsets.ReadOnlyModelViewSet):
 # pretty much done (need to add tests)
 class CommentViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
                      viewsets.GenericViewSet):
-    queryset = Comment.objects.all()
+    queryset = Comment.objects.select_related('commenter')
     serializer_class = CommentSerializer
     filter_fields = ['post', 'commenter']
 
     @detail_route(methods=['post'])
+    @idempotent
     def like(self, request, pk=None):
         comment = self.get_object()
         user = request.user
@@ -263,15 +482,17 @@ class CommentViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.Retr
         if not user.is_authenticated():
             return Response(status=status.HTTP_406_NOT_ACCEPTABLE)
 
-        existing = CommentLike.objects.filter(comment=comment, liker=user)
-        if existing.count() > 0:
+        try:
+            with transaction.atomic():
+                like = CommentLike.objects.create(comment=comment, liker=user)
+        except IntegrityError:
             return Response(status=status.HTTP_409_CONFLICT)
-        else:
-            like = CommentLike.objects.create(comment=comment, liker=user)
-            res = CommentLikeSerializer(like)
-            return Response(res.data, status=status.HTTP_202_ACCEPTED)
+
+        res = CommentLikeSerializer(like)
+        return Response(res.data, status=status.HTTP_202_ACCEPTED)
 
     @detail_route(methods=['post'])
+    @idempotent
     def unlike(self, request, pk=None):
         comment = self.get_object()
         user = request.user
@@ -279,14 +500,17 @@ class CommentViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.Retr
         if not user.is_authenticated():
             return Response(status=status.HTTP_406_NOT_ACCEPTABLE)
 
-        existing = CommentLike.objects.filter(comment=comment, liker=user)
+        deleted, _ = CommentLike.objects.filter(comment=comment, liker=user).delete()
 
-        if existing.count() == 0:
+        if deleted == 0:
             return Response(status=status.HTTP_409_CONFLICT)
         else:
-            existing.delete()
             return Response(status=status.HTTP_202_ACCEPTED)
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super(CommentViewSet, self).create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         user = self.request.user
 
@@ -303,7 +527,197 @@ class CommentLikeViewSet(viewsets.ReadOnlyModelViewSet):
     filter_fields = ['comment', 'liker']
 
 
-class BadgeViewSet(viewsets.ReadOnlyModelViewSet):
+class BadgeViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Badge.objects.all()
     serializer_class = BadgeSerializer
+    cache_namespace = 'badges'
     filter_fields = ['game', 'user', 'type']
+
+
+class LeaderboardViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = LeaderboardEntry.objects.select_related('user')
+    serializer_class = LeaderboardEntrySerializer
+    pagination_class = LeaderboardCursorPagination
+    filter_fields = ['game', 'alive']
+    max_window = 100
+
+    def get_window(self, request, default):
+        try:
+            return max(1, min(int(request.query_params.get('n', default)), self.max_window))
+        except ValueError:
+            return default
+
+    @list_route(methods=['get'])
+    def top(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).order_by('rank', 'id')
+        res = self.get_serializer(queryset[:self.get_window(request, 10)], many=True)
+        return Response(res.data)
+
+    @list_route(methods=['get'])
+    def around_me(self, request):
+        user = request.user
+        if not user.is_authenticated():
+            return Response({"Error": "User is not authenticated"}, status=status.HTTP_406_NOT_ACCEPTABLE)
+
+        try:
+            game = request.query_params.get('game')
+            game = int(game) if game else None
+        except ValueError:
+            return Response({"Error": "game must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        me = self.get_queryset().filter(game=game, user=user).first() if game else None
+        if me is None:
+            return Response({"Error": "User isn't on this game's leaderboard"}, status=status.HTTP_404_NOT_FOUND)
+
+        n = self.get_window(request, 5)
+        entries = self.get_queryset().filter(game=game)
+        above = entries.filter(Q(rank__lt=me.rank) | Q(rank=me.rank, id__lt=me.id)).order_by('-rank', '-id')[:n]
+        below = entries.filter(Q(rank__gt=me.rank) | Q(rank=me.rank, id__gt=me.id)).order_by('rank', 'id')[:n]
+
+        res = self.get_serializer(list(reversed(above)) + [me] + list(below), many=True)
+        return Response(res.data)
+
+
+# resumable video uploads: POST to start, PUT the bytes in any number of chunks, then finalize and pass the id
+# as `upload` when creating the post
+class UploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    queryset = Upload.objects.all()
+    serializer_class = UploadSerializer
+
+    def get_queryset(self):
+        user = self.request.user
+        if not user.is_authenticated():
+            return Upload.objects.none()
+        return Upload.objects.filter(user=user)
+
+    def perform_create(self, serializer):
+        user = self.request.user
+
+        if not user.is_authenticated():
+            raise ValidationError('You need to log in')
+        if not 0 < serializer.validated_data['size'] <= uploads.max_upload_size():
+            raise ValidationError('Upload size must be between 1 and %d bytes' % uploads.max_upload_size())
+
+        serializer.save(user=user)
+
+    # no transaction around this: a chunk from a phone on a slow connection can take a while to arrive and sqlite
+    # would stay locked all that time. the bytes go to the partial file first, then a conditional update moves the
+    # offset past them. a request that raced another chunk for the same offset matches no row and gets a 409
+    def update(self, request, pk=None):
+        upload = self.get_object()
+
+        if upload.status != 'u':
+            return Response({"Error": "Upload is already complete"}, status=status.HTTP_409_CONFLICT)
+
+        # a client resuming after a dropped connection asks for the offset and sends from there
+        offset = uploads.chunk_offset(request)
+        if offset != upload.offset:
+            return Response({"Error": "Chunk doesn't start at the current offset", "offset": upload.offset},
+                            status=status.HTTP_409_CONFLICT)
+
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        if upload.offset + length > upload.size:
+            return Response({"Error": "Chunk runs past the end of the upload", "offset": upload.offset},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        written = uploads.write_chunk(upload, request.stream)
+        if not Upload.objects.filter(pk=upload.pk, offset=upload.offset, status='u').update(
+                offset=upload.offset + written):
+            upload.refresh_from_db()
+            return Response({"Error": "Upload moved on while the chunk was sent", "offset": upload.offset},
+                            status=status.HTTP_409_CONFLICT)
+        upload.offset += written
+
+        res = UploadSerializer(upload, context={'request': request})
+        return Response(res.data, status=status.HTTP_200_OK)
+
+    @detail_route(methods=['post'])
+    @transaction.atomic
+    def finalize(self, request, pk=None):
+        upload = self.get_object()
+        upload = Upload.objects.select_for_update().get(pk=upload.pk)
+
+        if upload.status != 'u':
+            return Response({"Error": "Upload is already complete"}, status=status.HTTP_409_CONFLICT)
+        if upload.offset != upload.size:
+            return Response({"Error": "Upload is missing bytes", "offset": upload.offset},
+                            status=status.HTTP_409_CONFLICT)
+
+        upload.file = uploads.finalize(upload)
+        upload.status = 'c'
+        upload.save(update_fields=['file', 'status'])
+
+        res = UploadSerializer(upload, context={'request': request})
+        return Response(res.data, status=status.HTTP_202_ACCEPTED)
+
+
+# server-sent events for one game (or every game with no ?game=), so clients stop polling posts and statuses.
+# EventSource reconnects on its own and sends Last-Event-ID to pick up where it left off
+class EventStreamView(APIView):
+    renderer_classes = (JSONRenderer, events.EventStreamRenderer)
+
+    def get(self, request):
+        user = request.user
+        if not user.is_authenticated():
+            return Response({"Error": "User is not authenticated"}, status=status.HTTP_406_NOT_ACCEPTABLE)
+
+        try:
+            game = request.query_params.get('game')
+            game = int(game) if game else None
+        except ValueError:
+            return Response({"Error": "game must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            subscription = events.get_broker().subscribe(user.pk, game, request.META.get('HTTP_LAST_EVENT_ID') or None)
+        except ValueError:
+            return Response({"Error": "Last-Event-ID is not an event id"}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(events.EventStream(subscription), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # nginx would otherwise hold events back until its buffer fills
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+# percentiles and histograms per view from ProfilingMiddleware, for this worker process. DELETE starts over
+class ProfilingView(APIView):
+
+    def check_staff(self, request):
+        user = request.user
+        if not user.is_authenticated() or not user.is_staff:
+            return Response({"Error": "User is not an admin"}, status=status.HTTP_406_NOT_ACCEPTABLE)
+        if not profiling.enabled():
+            return Response({"Error": "Profiling is not enabled"}, status=status.HTTP_404_NOT_FOUND)
+
+    def get(self, request):
+        return self.check_staff(request) or Response(profiling.summary())
+
+    def delete(self, request):
+        error = self.check_staff(request)
+        if error:
+            return error
+        profiling.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+# ?q=...[&type=users|posts|comments][&game=id]. usernames and names match by prefix, captions and comments are
+# ranked by relevance
+class SearchView(APIView):
+    types = ('users', 'posts', 'comments')
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        types = [t for t in request.query_params.get('type', ','.join(self.types)).split(',') if t in self.types]
+        try:
+            game = int(request.query_params['game']) if request.query_params.get('game') else None
+        except ValueError:
+            return Response({"Error": "game must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        context = {'request': request}
+        res = {}
+        if 'users' in types:
+            res['users'] = UserSerializer(search.users(query), many=True, context=context).data
+        if 'posts' in types:
+            res['posts'] = PostSerializer(search.posts(query, game), many=True, context=context).data
+        if 'comments' in types:
+            res['comments'] = CommentSerializer(search.comments(query, game), many=True, context=context).data
+        return Response(res)